@@ -43,6 +43,18 @@ else:
         ['gdal-config', '--libs'], capture_output=True, text=True
     ).stdout.split()[0][2:]] # get the first argument which is the library path
 
+# kernels_core fills kernels in OpenMP parallel loops.  Apple's clang does not
+# ship with OpenMP, so those loops run serially on macOS.
+if platform.system() == 'Windows':
+    openmp_compile_args = ['/openmp']
+    openmp_link_args = []
+elif platform.system() == 'Darwin':
+    openmp_compile_args = []
+    openmp_link_args = []
+else:
+    openmp_compile_args = ['-fopenmp']
+    openmp_link_args = ['-fopenmp']
+
 setup(
     name='pygeoprocessing',
     description="PyGeoprocessing: Geoprocessing routines for GIS",
@@ -98,5 +110,16 @@ setup(
             define_macros=[('NPY_NO_DEPRECATED_API', 'NPY_1_7_API_VERSION')],
             language="c++"
         ),
+        Extension(
+            "pygeoprocessing.kernels_core",
+            sources=['src/pygeoprocessing/kernels_core.pyx'],
+            include_dirs=include_dirs,
+            extra_compile_args=(
+                compiler_args + compiler_and_linker_args +
+                openmp_compile_args),
+            extra_link_args=compiler_and_linker_args + openmp_link_args,
+            define_macros=[('NPY_NO_DEPRECATED_API', 'NPY_1_7_API_VERSION')],
+            language="c++"
+        ),
     ])
 )
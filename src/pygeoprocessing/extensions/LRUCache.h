@@ -67,6 +67,17 @@ template <class KEY_T, class VAL_T,
     return (item_map.count(key) > 0);
   };
 
+  // Return whether a key is the most recently used one in the cache.
+  bool is_front(const KEY_T &key) {
+    return (not item_list.empty()) and item_list.front().first == key;
+  };
+
+  // Return the cached value of the most recently used key.
+  VAL_T& front() {
+    assert(not item_list.empty());
+    return item_list.front().second;
+  };
+
   // Return the cached value associated with a key.
   VAL_T& get(const KEY_T &key) {
     MapIter it = item_map.find(key);
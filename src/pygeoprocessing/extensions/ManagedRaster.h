@@ -192,12 +192,8 @@ class ManagedRaster {
       // this is the flat index for the block
       int block_index = block_yi * block_nx + block_xi;
 
-      if (not lru_cache->exist(block_index)) {
-        _load_block(block_index);
-      }
-
       int idx = ((yi & block_ymod) * actualBlockWidths[block_index]) + (xi & block_xmod);
-      lru_cache->get(block_index)[idx] = value;
+      _get_block(block_index)[idx] = value;
       if (write_mode) {
         std::set<int>::iterator dirty_itr = dirty_blocks.find(block_index);
         if (dirty_itr == dirty_blocks.end()) {
@@ -214,12 +210,7 @@ class ManagedRaster {
       // this is the flat index for the block
       int block_index = block_yi * block_nx + block_xi;
 
-      if (not lru_cache->exist(block_index)) {
-        _load_block(block_index);
-      }
-      double* block = lru_cache->get(block_index);
-
-
+      double* block = _get_block(block_index);
 
       // Using the property n % 2^i = n & (2^i - 1)
       // to efficienty compute the modulo: yi % block_xsize
@@ -229,6 +220,23 @@ class ManagedRaster {
       return value;
     }
 
+    // Returns the cached buffer of a block, loading it if needed.
+    // Consecutive reads and writes usually fall in the same block, which is
+    // then already the most recently used one and needs no map lookup.  This
+    // is checked on the LRU cache itself rather than remembered here because
+    // copies of a ManagedRaster share one cache.
+    // Args:
+    //   block_index: Index of the block, counted from the top-left
+    inline double* _get_block(int block_index) {
+      if (lru_cache->is_front(block_index)) {
+        return lru_cache->front();
+      }
+      if (not lru_cache->exist(block_index)) {
+        _load_block(block_index);
+      }
+      return lru_cache->get(block_index);
+    }
+
     // Reads a block from the raster and saves it to the cache.
     // Args:
     //   block_index: Index of the block to read, counted from the top-left
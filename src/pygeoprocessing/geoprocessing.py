@@ -2956,14 +2956,18 @@ def calculate_disjoint_polygon_set(
         else:
             polygon = poly_geom
         for intersect_poly_fid in possible_intersection_set:
+            # A polygon always intersects itself, no need to ask GEOS.
+            if intersect_poly_fid == poly_fid:
+                poly_intersect_lookup[poly_fid].add(intersect_poly_fid)
+                continue
+
             # If geometries touch (share 1+ boundary point), then do not count
             # it as an intersection.
             if geometries_may_touch and polygon.touches(
                     shapely_polygon_lookup[intersect_poly_fid]):
                 continue
 
-            if intersect_poly_fid == poly_fid or polygon.intersects(
-                    shapely_polygon_lookup[intersect_poly_fid]):
+            if polygon.intersects(shapely_polygon_lookup[intersect_poly_fid]):
                 poly_intersect_lookup[poly_fid].add(intersect_poly_fid)
         polygon = None
     LOGGER.info(
@@ -29,9 +29,22 @@ included here:
       https://en.wikipedia.org/wiki/Kernel_(image_processing)
     * :meth:`create_distance_decay_kernel`, for kernels that are a function of
       distance from the center pixel
+
+The built-in kernels may optionally be cached on disk.  If the environment
+variable ``PYGEOPROCESSING_KERNEL_CACHE_DIR`` is set to a directory, each
+built-in kernel is stored there after it is created, and requesting the same
+kernel again (with the same parameters) copies the cached kernel rather than
+recomputing it.  Kernels written to GDAL virtual filesystems (``/vsi`` paths)
+are not cached.
 """
+import collections
+import concurrent.futures
+import hashlib
 import logging
 import math
+import os
+import shutil
+import tempfile
 from typing import Callable
 from typing import Text
 from typing import Union
@@ -41,11 +54,29 @@ import pygeoprocessing
 from numpy.typing import ArrayLike
 from osgeo import gdal
 
+from . import kernels_core
 from .utils import gdal_use_exceptions
 
 FLOAT32_NODATA = float(numpy.finfo(numpy.float32).min)
 LOGGER = logging.getLogger(__name__)
 
+# If set, the built-in kernels are cached in this directory and copied from
+# the cache when the same kernel is requested again.
+KERNEL_CACHE_DIR_ENV = 'PYGEOPROCESSING_KERNEL_CACHE_DIR'
+
+# Kernels smaller than this (in bytes) are built and written in a single call.
+# Larger kernels are built and written in strips that together with the
+# quadrant rows they are reflected from stay under this size.
+_MAX_IN_MEMORY_KERNEL_BYTES = 2 ** 28  # 256 MiB
+
+# Compiled routines that fill the quadrant of each built-in kernel type.
+_QUADRANT_FUNCTIONS = {
+    'dichotomy': kernels_core.dichotomous_quadrant,
+    'exponential': kernels_core.exponential_decay_quadrant,
+    'linear': kernels_core.linear_decay_quadrant,
+    'gaussian': kernels_core.normal_distribution_quadrant,
+}
+
 
 def kernel_from_numpy_array(
         numpy_array: ArrayLike, target_kernel_path: Text) -> None:
@@ -91,12 +122,10 @@ def dichotomous_kernel(
     Returns:
         ``None``
     """
-    def _dichotomous(dist):
-        return dist <= max_distance
-
-    create_distance_decay_kernel(
+    _create_kernel(
         target_kernel_path=target_kernel_path,
-        distance_decay_function=_dichotomous,
+        kernel_type='dichotomy',
+        params={},
         max_distance=max_distance,
         normalize=normalize
     )
@@ -129,12 +158,10 @@ def exponential_decay_kernel(
     Returns:
         ``None``
     """
-    def _exponential_decay(dist):
-        return numpy.exp(-dist / expected_distance)
-
-    create_distance_decay_kernel(
+    _create_kernel(
         target_kernel_path=target_kernel_path,
-        distance_decay_function=_exponential_decay,
+        kernel_type='exponential',
+        params={'expected_distance': expected_distance},
         max_distance=max_distance,
         normalize=normalize
     )
@@ -162,12 +189,10 @@ def linear_decay_kernel(
     Returns:
         ``None``
     """
-    def _linear_decay(dist):
-        return (max_distance - dist) / max_distance
-
-    create_distance_decay_kernel(
+    _create_kernel(
         target_kernel_path=target_kernel_path,
-        distance_decay_function=_linear_decay,
+        kernel_type='linear',
+        params={},
         max_distance=max_distance,
         normalize=normalize
     )
@@ -197,14 +222,11 @@ def normal_distribution_kernel(
     Returns:
         ``None``
     """
-    def _normal_decay(dist):
-        return (1 / (2 * numpy.pi * sigma ** 2)) * numpy.exp(
-            (-dist ** 2) / (2 * sigma ** 2))
-
-    create_distance_decay_kernel(
+    _create_kernel(
         target_kernel_path=target_kernel_path,
-        distance_decay_function=_normal_decay,
-        max_distance=(sigma * n_std_dev),
+        kernel_type='gaussian',
+        params={'sigma': sigma},
+        max_distance=sigma * n_std_dev,
         normalize=normalize
     )
 
@@ -237,95 +259,316 @@ def create_distance_decay_kernel(
             ``0.0``.
         normalize=False (bool): Whether to normalize the resulting kernel.
 
+    Returns:
+        ``None``
+    """
+    # If the user provided a string rather than a callable, assume it's a
+    # python expression appropriate for evaling.
+    if isinstance(distance_decay_function, str):
+        # Avoid recompiling on each iteration.
+        code = compile(distance_decay_function, '<string>', 'eval')
+        numpy_namespace = {name: getattr(numpy, name) for name in dir(numpy)}
+
+        def distance_decay_function(d):
+            result = eval(
+                code,
+                numpy_namespace,  # globals
+                {'dist': d, 'max_dist': max_distance})  # locals
+            return result
+
+    def quadrant_rows(row_start, row_stop):
+        return _decay_quadrant_rows(
+            distance_decay_function, max_distance, row_start, row_stop)
+
+    _write_kernel(target_kernel_path, quadrant_rows, max_distance, normalize)
+
+
+def _decay_quadrant_rows(decay_function, max_distance, row_start, row_stop):
+    """Evaluate rows of the quadrant of a distance decay kernel.
+
+    Args:
+        decay_function (callable): Called with a 1D float32 numpy array of
+            distances from the center pixel and returns the kernel's values
+            at those distances.
+        max_distance (float): The maximum distance of nonzero kernel values
+            from the center pixel.
+        row_start (int): The first row of the quadrant to evaluate.
+        row_stop (int): The last row of the quadrant to evaluate, exclusive.
+
+    Returns:
+        A tuple of a float32 numpy array of the quadrant rows
+        ``[row_start, row_stop)`` and the sum of the kernel pixels reflected
+        from those rows.
+    """
+    apothem = math.floor(max_distance)
+    # Compare squared distances against the squared radius so that square
+    # roots are only taken for pixels within ``max_distance``.  Squared pixel
+    # offsets are exact in float64, so this selects the same pixels as the
+    # built-in kernels in ``kernels_core``.  Distances are only reduced to
+    # float32 once they are computed.
+    cols = numpy.arange(apothem + 1, dtype=numpy.float64)
+    rows = numpy.arange(row_start, row_stop, dtype=numpy.float64)
+    dist_sq = numpy.add.outer(rows * rows, cols * cols)
+    within_distance = dist_sq <= max_distance ** 2
+    if row_start == 0 and row_stop == apothem + 1:
+        # The kernel is a function of distance from the centerpoint alone, so
+        # it is 8-way symmetric.  When the whole quadrant is requested, only
+        # evaluate one octant (the upper triangle of the quadrant) and mirror
+        # it across the diagonal to complete the quadrant.
+        within_distance = numpy.triu(within_distance)
+    distances = numpy.sqrt(dist_sq[within_distance]).astype(numpy.float32)
+    del dist_sq
+    quadrant = numpy.zeros(within_distance.shape, dtype=numpy.float32)
+    quadrant[within_distance] = decay_function(distances)
+    if row_start == 0 and row_stop == apothem + 1:
+        quadrant += numpy.triu(quadrant, k=1).T
+    return quadrant, _quadrant_rows_sum(quadrant, row_start)
+
+
+def _quadrant_rows_sum(quadrant_rows, row_start):
+    """Sum the kernel pixels reflected from rows of the kernel's quadrant.
+
+    Args:
+        quadrant_rows (numpy.ndarray): A float32 array of consecutive rows of
+            the lower-right quadrant of the kernel, including every column.
+        row_start (int): The quadrant row of ``quadrant_rows[0]``.
+
+    Returns:
+        The sum, as a float.
+    """
+    # Every pixel off the center row and column of the quadrant is reflected
+    # into both halves of the kernel.
+    row_sums = (
+        quadrant_rows[:, 0].astype(numpy.float64) +
+        2 * quadrant_rows[:, 1:].sum(axis=1, dtype=numpy.float64))
+    row_sums[1 if row_start == 0 else 0:] *= 2
+    return float(row_sums.sum())
+
+
+def _create_kernel(
+        target_kernel_path, kernel_type, params, max_distance, normalize):
+    """Create one of the built-in kernel types.
+
+    Args:
+        target_kernel_path (string): The path to where the kernel should be
+            written on disk.
+        kernel_type (string): One of ``'dichotomy'``, ``'exponential'``,
+            ``'linear'`` or ``'gaussian'``.
+        params (dict): Keyword arguments specific to ``kernel_type``, other
+            than ``max_distance``.  ``'exponential'`` requires
+            ``expected_distance`` and ``'gaussian'`` requires ``sigma``.
+        max_distance (float): The maximum distance of nonzero kernel values
+            from the center pixel.
+        normalize (bool): Whether to normalize the resulting kernel.
+
+    Returns:
+        ``None``
+    """
+    try:
+        quadrant_function = _QUADRANT_FUNCTIONS[kernel_type]
+    except KeyError:
+        raise ValueError(
+            f'Unknown kernel type "{kernel_type}", must be one of '
+            f'{", ".join(sorted(_QUADRANT_FUNCTIONS))}')
+
+    cache_dir = os.environ.get(KERNEL_CACHE_DIR_ENV)
+    if cache_dir and target_kernel_path.startswith('/vsi'):
+        # Kernels are cached by copying files, which can't reach GDAL's
+        # virtual filesystems.
+        LOGGER.debug(
+            f'Not caching kernel {target_kernel_path} on a GDAL virtual '
+            'filesystem')
+        cache_dir = None
+    if cache_dir:
+        # Include the version so that kernels are rebuilt if their
+        # definitions change between releases.  The parameters are all
+        # numbers, so convert them to floats to give equal values (such as
+        # ``10`` and ``10.0``) the same key.
+        cache_key = hashlib.sha1(repr((
+            pygeoprocessing.__version__, kernel_type,
+            sorted((name, float(value)) for name, value in params.items()),
+            float(max_distance), bool(normalize))).encode('utf-8')).hexdigest()
+        cached_kernel_path = os.path.join(cache_dir, f'{cache_key}.tif')
+        if os.path.exists(cached_kernel_path):
+            LOGGER.debug(
+                f'Copying cached kernel {cached_kernel_path} to '
+                f'{target_kernel_path}')
+            shutil.copyfile(cached_kernel_path, target_kernel_path)
+            return
+
+    def quadrant_rows(row_start, row_stop):
+        return quadrant_function(
+            max_distance=max_distance, row_start=row_start,
+            row_stop=row_stop, **params)
+
+    _write_kernel(target_kernel_path, quadrant_rows, max_distance, normalize)
+
+    if cache_dir:
+        # Copy to a temporary file first so that other processes sharing the
+        # cache never see a partially-copied kernel.  The kernel has already
+        # been written to ``target_kernel_path``, so failing to cache it is
+        # not an error.
+        tmp_kernel_path = None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_kernel_path = tempfile.mkstemp(
+                suffix='.tif', dir=cache_dir)
+            os.close(fd)
+            shutil.copyfile(target_kernel_path, tmp_kernel_path)
+            os.replace(tmp_kernel_path, cached_kernel_path)
+            tmp_kernel_path = None
+        except OSError as error:
+            LOGGER.warning(
+                f'Could not cache kernel in {cache_dir}: {error}')
+        finally:
+            if tmp_kernel_path is not None:
+                try:
+                    os.remove(tmp_kernel_path)
+                except OSError:
+                    pass
+
+
+@gdal_use_exceptions
+def _write_kernel(target_kernel_path, quadrant_rows, max_distance, normalize):
+    """Write a radially symmetric kernel raster from rows of its quadrant.
+
+    Args:
+        target_kernel_path (string): The path to where the kernel should be
+            written on disk.
+        quadrant_rows (callable): Called as
+            ``quadrant_rows(row_start, row_stop)`` and returns a tuple of a
+            float32 numpy array of the rows ``[row_start, row_stop)`` of the
+            lower-right quadrant of the kernel, where row and column ``0``
+            are the center pixel's, and the sum of the kernel pixels
+            reflected from those rows.  The returned array may be modified.
+        max_distance (float): The maximum distance of nonzero kernel values
+            from the center pixel.
+        normalize (bool): Whether to normalize the resulting kernel.
+
     Returns:
         ``None``
     """
     apothem = math.floor(max_distance)
     kernel_size = apothem * 2 + 1  # allow for a center pixel
     assert kernel_size % 2 == 1
+    # Fewer, larger blocks amortize the per-block overhead of writing the
+    # kernel.  GTiff tiles must be a multiple of 16 pixels on a side, so use
+    # the smallest power of two that covers the kernel, up to 1024.
+    block_size = min(1024, max(16, 1 << (kernel_size - 1).bit_length()))
     driver = gdal.GetDriverByName('GTiff')
-    kernel_dataset = driver.Create(
+    kernel_raster = driver.Create(
         target_kernel_path.encode('utf-8'), kernel_size, kernel_size, 1,
         gdal.GDT_Float32, options=[
-            'BIGTIFF=IF_SAFER', 'TILED=YES', 'BLOCKXSIZE=256',
-            'BLOCKYSIZE=256'])
+            'BIGTIFF=IF_SAFER', 'TILED=YES', f'BLOCKXSIZE={block_size}',
+            f'BLOCKYSIZE={block_size}'])
 
     # NOTE: We are deliberately NOT setting a coordinate system because it
     # isn't needed.  By omitting this, we're telling GDAL to just create a
     # TIFF.
 
-    kernel_band = kernel_dataset.GetRasterBand(1)
+    # The new dataset is already open for writing, so write the blocks
+    # through this handle rather than closing and reopening the raster.
+    kernel_band = kernel_raster.GetRasterBand(1)
     kernel_nodata = FLOAT32_NODATA
     kernel_band.SetNoDataValue(kernel_nodata)
 
+    if kernel_size * kernel_size * 4 < _MAX_IN_MEMORY_KERNEL_BYTES:
+        # Most kernels are small enough to build the whole quadrant, reflect
+        # it in full and write it at once.
+        quadrant, kernel_sum = quadrant_rows(0, apothem + 1)
+        if normalize:
+            # The sum of the kernel is already known, so normalize before
+            # writing rather than making a second pass over the kernel
+            # raster.  Multiply by the reciprocal in place rather than
+            # dividing each pixel.
+            numpy.multiply(
+                quadrant, numpy.float32(1 / kernel_sum), out=quadrant)
+        kernel_band.WriteArray(_reflect_quadrant_rows(
+            quadrant, numpy.abs(numpy.arange(-apothem, apothem + 1))))
+        kernel_raster.FlushCache()
+        kernel_band = None
+        kernel_raster = None
+        return
+
+    # Larger kernels are written in strips of whole rows, and each strip is
+    # reflected from only the quadrant rows it covers, so neither the kernel
+    # nor its quadrant is ever held in memory.  Strips are a row of blocks
+    # high unless that would take more than a quarter of the in-memory limit,
+    # since a strip and the quadrant rows it is built from are both held
+    # while the previous strip is written.
+    _, block_y_size = kernel_band.GetBlockSize()
+    strip_rows = max(1, min(
+        block_y_size, _MAX_IN_MEMORY_KERNEL_BYTES // (16 * kernel_size)))
+
+    kernel_scale = None
+    if normalize:
+        # Normalizing before writing needs the sum of the whole kernel first.
+        kernel_sum = 0
+        for row_start in range(0, apothem + 1, strip_rows):
+            kernel_sum += quadrant_rows(
+                row_start, min(row_start + strip_rows, apothem + 1))[1]
+        kernel_scale = numpy.float32(1 / kernel_sum)
+
+    # Build the next strip in a worker thread (numpy and the compiled kernels
+    # release the GIL) while this thread writes the previous one.  GDAL
+    # datasets may not be written from more than one thread at a time.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        pending_strips = collections.deque()
+        for yoff in range(0, kernel_size, strip_rows):
+            pending_strips.append((yoff, executor.submit(
+                _kernel_strip, quadrant_rows, apothem, yoff,
+                min(yoff + strip_rows, kernel_size), kernel_scale)))
+            if len(pending_strips) > 1:
+                strip_yoff, future = pending_strips.popleft()
+                kernel_band.WriteArray(future.result(), xoff=0, yoff=strip_yoff)
+        while pending_strips:
+            strip_yoff, future = pending_strips.popleft()
+            kernel_band.WriteArray(future.result(), xoff=0, yoff=strip_yoff)
+
+    kernel_raster.FlushCache()
     kernel_band = None
-    kernel_dataset = None
+    kernel_raster = None
 
-    kernel_raster = gdal.OpenEx(target_kernel_path, gdal.GA_Update)
-    kernel_band = kernel_raster.GetRasterBand(1)
-    band_x_size = kernel_band.XSize
-    band_y_size = kernel_band.YSize
-    running_sum = 0
 
-    # If the user provided a string rather than a callable, assume it's a
-    # python expression appropriate for evaling.
-    if isinstance(distance_decay_function, str):
-        # Avoid recompiling on each iteration.
-        code = compile(distance_decay_function, '<string>', 'eval')
-        numpy_namespace = {name: getattr(numpy, name) for name in dir(numpy)}
+def _kernel_strip(quadrant_rows, apothem, kernel_ymin, kernel_ymax, scale):
+    """Build a strip of whole kernel rows from the quadrant rows it covers.
 
-        def distance_decay_function(d):
-            result = eval(
-                code,
-                numpy_namespace,  # globals
-                {'dist': d, 'max_dist': max_distance})  # locals
-            return result
-
-    for block_data in pygeoprocessing.iterblocks(
-            (target_kernel_path, 1), offset_only=True):
-        array_xmin = block_data['xoff'] - apothem
-        array_xmax = min(
-            array_xmin + block_data['win_xsize'],
-            band_x_size - apothem)
-        array_ymin = block_data['yoff'] - apothem
-        array_ymax = min(
-            array_ymin + block_data['win_ysize'],
-            band_y_size - apothem)
-
-        pixel_dist_from_center = numpy.hypot(
-            *numpy.mgrid[
-                array_ymin:array_ymax,
-                array_xmin:array_xmax])
-
-        valid_pixels = (pixel_dist_from_center <= max_distance)
-
-        kernel = numpy.zeros(pixel_dist_from_center.shape,
-                             dtype=numpy.float32)
-        kernel[valid_pixels] = distance_decay_function(
-            pixel_dist_from_center[valid_pixels])
+    Args:
+        quadrant_rows (callable): Returns rows of the kernel's quadrant, as
+            described in ``_write_kernel``.
+        apothem (int): The number of pixels between the center pixel and the
+            edge of the kernel.
+        kernel_ymin (int): The first row of the strip, inclusive.
+        kernel_ymax (int): The last row of the strip, exclusive.
+        scale (numpy.float32): If not ``None``, the kernel is multiplied by
+            this value.
 
-        if normalize:
-            running_sum += kernel.sum()
+    Returns:
+        A C-contiguous float32 numpy array of the strip's kernel values.
+    """
+    offsets = numpy.abs(numpy.arange(
+        kernel_ymin - apothem, kernel_ymax - apothem))
+    row_start = offsets.min()
+    rows, _ = quadrant_rows(row_start, offsets.max() + 1)
+    if scale is not None:
+        numpy.multiply(rows, scale, out=rows)
+    return _reflect_quadrant_rows(rows, offsets - row_start)
 
-        kernel_band.WriteArray(
-            kernel,
-            yoff=block_data['yoff'],
-            xoff=block_data['xoff'])
 
-    kernel_raster.FlushCache()
-    kernel_band = None
-    kernel_raster = None
+def _reflect_quadrant_rows(quadrant_rows, row_indexes):
+    """Reflect whole kernel rows from rows of the kernel's quadrant.
 
-    if normalize:
-        kernel_raster = gdal.OpenEx(target_kernel_path, gdal.GA_Update)
-        kernel_band = kernel_raster.GetRasterBand(1)
-        for block_data, kernel_block in pygeoprocessing.iterblocks(
-                (target_kernel_path, 1)):
-            # divide by sum to normalize
-            kernel_block /= running_sum
-            kernel_band.WriteArray(
-                kernel_block, xoff=block_data['xoff'], yoff=block_data['yoff'])
+    Args:
+        quadrant_rows (numpy.ndarray): A float32 array of rows of the
+            lower-right quadrant of the kernel, including every column.
+        row_indexes (numpy.ndarray): The index in ``quadrant_rows`` of each
+            kernel row to reflect.
 
-        kernel_raster.FlushCache()
-        kernel_band = None
-        kernel_raster = None
+    Returns:
+        A C-contiguous float32 numpy array of the kernel rows.
+        ``Band.WriteArray`` passes arrays like this straight to GDAL's
+        ``RasterIO`` without converting or copying them.
+    """
+    apothem = quadrant_rows.shape[1] - 1
+    return quadrant_rows[numpy.ix_(
+        row_indexes, numpy.abs(numpy.arange(-apothem, apothem + 1)))]
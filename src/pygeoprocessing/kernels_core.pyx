@@ -0,0 +1,330 @@
+# coding=UTF-8
+# distutils: language=c++
+# cython: language_level=3
+"""Compiled routines for the kernels in ``pygeoprocessing.kernels``.
+
+Every kernel built here is a function of the distance from the kernel's
+center pixel, so each routine fills only the lower-right quadrant of the
+kernel (the center pixel is at index ``[0, 0]``).  The full kernel is then
+reflected from the quadrant as it is written to disk.  Large kernels ask for
+the quadrant in bands of rows so that it is never held in memory at once.
+
+When the whole quadrant is requested, each routine evaluates a single octant
+of the quadrant, one row at a time.
+The ``max_distance`` threshold is resolved once per row into the last column
+within range, so the decay formula is evaluated directly into the output
+buffer by a branch-free, contiguous loop that the compiler can vectorize.
+Each row is then mirrored across the quadrant's diagonal while it is still
+in cache, and the sum of the full kernel is accumulated at the same time so
+that normalizing the kernel does not require another pass over its pixels.
+
+Rows of the octant are filled in parallel with OpenMP where the extension
+was built with OpenMP support, and the GIL is released while filling so that
+several kernels may be built concurrently from Python threads.
+
+Bands of rows are filled in full rather than mirrored, since a band's
+mirror image lies outside of the band.
+"""
+cimport cython
+cimport libc.math as cmath
+from cython.parallel cimport prange
+import numpy
+
+
+cdef inline int _apothem(double max_distance):
+    return <int>cmath.floor(max_distance)
+
+
+cdef inline int _last_col_within(
+        int row, int col_start, int apothem,
+        double max_distance_sq) noexcept nogil:
+    """Find the last column of a quadrant row within ``max_distance``.
+
+    Returns a value less than ``col_start`` if no pixel of the row from
+    ``col_start`` on is within ``max_distance``.
+    """
+    cdef double row_sq = <double>row * row
+    cdef int col
+    if row_sq > max_distance_sq:
+        return col_start - 1
+    col = <int>cmath.sqrt(max_distance_sq - row_sq)
+    # Correct for any rounding in the square root so that the bound agrees
+    # exactly with comparing each pixel's squared distance.
+    while col < apothem and row_sq + <double>(col + 1) * (col + 1) <= (
+            max_distance_sq):
+        col += 1
+    while col >= col_start and row_sq + <double>col * col > max_distance_sq:
+        col -= 1
+    return min(col, apothem)
+
+
+cdef inline double _n_kernel_pixels(int row, int col) noexcept nogil:
+    """Count the kernel pixels that share the value of octant pixel (row, col).
+
+    Pixels off the center row and column are reflected into both halves of
+    the kernel, and pixels off the diagonal are also mirrored across it.
+    """
+    cdef double n_pixels = 1
+    if row != 0:
+        n_pixels *= 2
+    if col != 0:
+        n_pixels *= 2
+    if row != col:
+        n_pixels *= 2
+    return n_pixels
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void _mirror_row(
+        float[:, ::1] quadrant, double[::1] row_sums, int row,
+        int col_stop) noexcept nogil:
+    """Mirror an octant row across the diagonal and add it to the kernel sum.
+
+    Kept apart from the loops that evaluate the octant so that those loops
+    are branch-free and write contiguously, which lets the compiler
+    vectorize them.
+    """
+    cdef int col
+    cdef float value
+    for col in range(row, col_stop):
+        value = quadrant[row, col]
+        quadrant[col, row] = value
+        row_sums[row] += value * _n_kernel_pixels(row, col)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void _sum_row(
+        float[:, ::1] quadrant, double[::1] row_sums, int index, int row,
+        int col_stop) noexcept nogil:
+    """Add a full quadrant row, stored at ``index``, to the kernel sum."""
+    cdef int col
+    cdef double row_sum = 0
+    for col in range(1, col_stop):
+        row_sum += quadrant[index, col]
+    row_sum = 2 * row_sum + quadrant[index, 0]
+    if row != 0:
+        row_sum *= 2
+    row_sums[index] = row_sum
+
+
+def _quadrant_rows(int apothem, int row_start, row_stop):
+    """Allocate the quadrant rows ``[row_start, row_stop)`` and their sums.
+
+    Returns:
+        A tuple of ``row_stop`` (``apothem + 1`` if it was ``None``), whether
+        the whole quadrant was requested, the zeroed float32 rows and the
+        zeroed float64 per-row kernel sums.
+    """
+    if row_stop is None:
+        row_stop = apothem + 1
+    if not 0 <= row_start < row_stop <= apothem + 1:
+        raise ValueError(
+            f'Invalid quadrant rows [{row_start}, {row_stop}) for a quadrant '
+            f'of {apothem + 1} rows')
+    return (
+        row_stop, row_start == 0 and row_stop == apothem + 1,
+        numpy.zeros((row_stop - row_start, apothem + 1), dtype=numpy.float32),
+        numpy.zeros(row_stop - row_start, dtype=numpy.float64))
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def dichotomous_quadrant(
+        double max_distance, int row_start=0, row_stop=None):
+    """Fill a quadrant of a dichotomous kernel.
+
+    Args:
+        max_distance (float): The distance threshold, in pixels.
+
+        row_start=0 (int): The first quadrant row to fill.
+        row_stop=None (int): The last quadrant row to fill, exclusive.
+            Defaults to ``apothem + 1``, the whole quadrant.
+
+    Returns:
+        A tuple of a float32 numpy array of the quadrant rows
+        ``[row_start, row_stop)``, of shape
+        ``(row_stop - row_start, apothem + 1)``, where pixels within
+        ``max_distance`` of the kernel's center are ``1.0``, and the sum of
+        the kernel pixels reflected from those rows.
+    """
+    cdef int apothem = _apothem(max_distance)
+    cdef int n_rows, index
+    cdef bint octant
+    cdef float[:, ::1] quadrant
+    cdef double[::1] row_sums
+    row_stop, octant, quadrant, row_sums = _quadrant_rows(
+        apothem, row_start, row_stop)
+    n_rows = row_stop - row_start
+    cdef double max_distance_sq = max_distance * max_distance
+    cdef int row, col, col_start, col_stop
+    for index in prange(n_rows, nogil=True, schedule='dynamic'):
+        row = row_start + index
+        col_start = row if octant else 0
+        col_stop = _last_col_within(
+            row, col_start, apothem, max_distance_sq) + 1
+        for col in range(col_start, col_stop):
+            quadrant[index, col] = 1
+        if octant:
+            _mirror_row(quadrant, row_sums, row, col_stop)
+        else:
+            _sum_row(quadrant, row_sums, index, row, col_stop)
+    return numpy.asarray(quadrant), numpy.sum(row_sums)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def exponential_decay_quadrant(
+        double max_distance, double expected_distance, int row_start=0,
+        row_stop=None):
+    """Fill a quadrant of an exponential decay kernel.
+
+    Args:
+        max_distance (float): The maximum distance of the kernel, in pixels.
+        expected_distance (float): The distance, in pixels, at which decayed
+            values equal ``1/e``.
+
+        row_start=0 (int): The first quadrant row to fill.
+        row_stop=None (int): The last quadrant row to fill, exclusive.
+            Defaults to ``apothem + 1``, the whole quadrant.
+
+    Returns:
+        A tuple of the float32 array of quadrant rows
+        ``[row_start, row_stop)``, of shape
+        ``(row_stop - row_start, apothem + 1)``, and the sum of the kernel
+        pixels reflected from those rows.
+    """
+    cdef int apothem = _apothem(max_distance)
+    cdef int n_rows, index
+    cdef bint octant
+    cdef float[:, ::1] quadrant
+    cdef double[::1] row_sums
+    row_stop, octant, quadrant, row_sums = _quadrant_rows(
+        apothem, row_start, row_stop)
+    n_rows = row_stop - row_start
+    cdef double max_distance_sq = max_distance * max_distance
+    cdef double inverse_expected_distance = 1 / expected_distance
+    cdef double row_sq
+    cdef int row, col, col_start, col_stop
+    for index in prange(n_rows, nogil=True, schedule='dynamic'):
+        row = row_start + index
+        col_start = row if octant else 0
+        col_stop = _last_col_within(
+            row, col_start, apothem, max_distance_sq) + 1
+        row_sq = <double>row * row
+        for col in range(col_start, col_stop):
+            # Evaluate in double precision and only round the result to the
+            # float32 kernel.  A single precision exponent argument loses
+            # accuracy in proportion to ``distance / expected_distance``.
+            quadrant[index, col] = <float>cmath.exp(
+                -cmath.sqrt(row_sq + <double>col * col) *
+                inverse_expected_distance)
+        if octant:
+            _mirror_row(quadrant, row_sums, row, col_stop)
+        else:
+            _sum_row(quadrant, row_sums, index, row, col_stop)
+    return numpy.asarray(quadrant), numpy.sum(row_sums)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def linear_decay_quadrant(
+        double max_distance, int row_start=0, row_stop=None):
+    """Fill a quadrant of a linear decay kernel.
+
+    Args:
+        max_distance (float): The maximum distance of the kernel, in pixels.
+
+        row_start=0 (int): The first quadrant row to fill.
+        row_stop=None (int): The last quadrant row to fill, exclusive.
+            Defaults to ``apothem + 1``, the whole quadrant.
+
+    Returns:
+        A tuple of the float32 array of quadrant rows
+        ``[row_start, row_stop)``, of shape
+        ``(row_stop - row_start, apothem + 1)``, and the sum of the kernel
+        pixels reflected from those rows.
+    """
+    cdef int apothem = _apothem(max_distance)
+    cdef int n_rows, index
+    cdef bint octant
+    cdef float[:, ::1] quadrant
+    cdef double[::1] row_sums
+    row_stop, octant, quadrant, row_sums = _quadrant_rows(
+        apothem, row_start, row_stop)
+    n_rows = row_stop - row_start
+    cdef double max_distance_sq = max_distance * max_distance
+    cdef double row_sq
+    cdef int row, col, col_start, col_stop
+    for index in prange(n_rows, nogil=True, schedule='dynamic'):
+        row = row_start + index
+        col_start = row if octant else 0
+        col_stop = _last_col_within(
+            row, col_start, apothem, max_distance_sq) + 1
+        row_sq = <double>row * row
+        for col in range(col_start, col_stop):
+            quadrant[index, col] = (
+                max_distance - cmath.sqrt(row_sq + <double>col * col)
+            ) / max_distance
+        if octant:
+            _mirror_row(quadrant, row_sums, row, col_stop)
+        else:
+            _sum_row(quadrant, row_sums, index, row, col_stop)
+    return numpy.asarray(quadrant), numpy.sum(row_sums)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def normal_distribution_quadrant(
+        double sigma, double max_distance, int row_start=0, row_stop=None):
+    """Fill a quadrant of a normal (gaussian) decay kernel.
+
+    Args:
+        sigma (float): The width (in pixels) of a standard deviation.
+        max_distance (float): The maximum distance of the kernel, in pixels.
+
+        row_start=0 (int): The first quadrant row to fill.
+        row_stop=None (int): The last quadrant row to fill, exclusive.
+            Defaults to ``apothem + 1``, the whole quadrant.
+
+    Returns:
+        A tuple of the float32 array of quadrant rows
+        ``[row_start, row_stop)``, of shape
+        ``(row_stop - row_start, apothem + 1)``, and the sum of the kernel
+        pixels reflected from those rows.
+    """
+    cdef int apothem = _apothem(max_distance)
+    cdef int n_rows, index
+    cdef bint octant
+    cdef float[:, ::1] quadrant
+    cdef double[::1] row_sums
+    row_stop, octant, quadrant, row_sums = _quadrant_rows(
+        apothem, row_start, row_stop)
+    n_rows = row_stop - row_start
+    cdef double max_distance_sq = max_distance * max_distance
+    cdef double two_sigma_sq = 2 * sigma * sigma
+    cdef double scale = 1 / (cmath.M_PI * two_sigma_sq)
+    cdef int row, col, col_start, col_stop
+
+    # The gaussian is separable: e**(-(y**2 + x**2) / (2 * sigma**2)) is the
+    # product of e**(-y**2 / (2 * sigma**2)) and e**(-x**2 / (2 * sigma**2)),
+    # so only one exponential per row/column offset is needed.
+    cdef double[::1] decay = numpy.empty(apothem + 1, dtype=numpy.float64)
+    for row in range(apothem + 1):
+        decay[row] = cmath.exp(-(<double>row * row) / two_sigma_sq)
+    for index in prange(n_rows, nogil=True, schedule='dynamic'):
+        row = row_start + index
+        col_start = row if octant else 0
+        col_stop = _last_col_within(
+            row, col_start, apothem, max_distance_sq) + 1
+        for col in range(col_start, col_stop):
+            quadrant[index, col] = scale * (decay[row] * decay[col])
+        if octant:
+            _mirror_row(quadrant, row_sums, row, col_stop)
+        else:
+            _sum_row(quadrant, row_sums, index, row, col_stop)
+    return numpy.asarray(quadrant), numpy.sum(row_sums)
@@ -2423,15 +2423,20 @@ def distance_to_channel_mfd(
 
     # these variables are used as pixel or neighbor indexes.
     # _n is related to a neighbor pixel
-    cdef unsigned int i_n, xi, yi, xi_n, yi_n
+    cdef unsigned int i_n, xi, yi, xi_n, yi_n, xi_root, yi_root
     cdef int flow_dir_weight, mfd_value
 
     # used to remember if the current pixel is a channel for routing
     cdef int is_a_channel
 
+    # set if the current pixel is pushed back onto the stack to wait for a
+    # downstream neighbor
+    cdef int preempted
+
     # `distance_to_channel_queue` is the data structure that walks upstream
     # from a defined flow distance pixel
     cdef stack[MFDFlowPixelType] distance_to_channel_stack
+    cdef MFDFlowPixelType pixel
 
     # properties of the parallel rasters
     cdef unsigned int raster_x_size, raster_y_size
@@ -2440,6 +2445,11 @@ def distance_to_channel_mfd(
     # come from a predefined flow accumulation weight raster
     cdef double weight_val
     cdef double weight_nodata = IMPROBABLE_FLOAT_NODATA
+    cdef int use_weight_raster = weight_raster_path_band is not None
+
+    # a downstream neighbor's distance to channel
+    cdef double n_distance
+    cdef double distance_nodata = -1
 
     # used for time-delayed logging
     cdef time_t last_log_time
@@ -2455,7 +2465,6 @@ def distance_to_channel_mfd(
                 "%s is supposed to be a raster band tuple but it's not." % (
                     path))
 
-    distance_nodata = -1
     pygeoprocessing.new_raster_from_base(
         flow_dir_mfd_raster_path_band[0],
         target_distance_to_channel_raster_path,
@@ -2491,7 +2500,7 @@ def distance_to_channel_mfd(
         flow_dir_mfd_raster_path_band[1])
 
     cdef ManagedRaster weight_raster
-    if weight_raster_path_band:
+    if use_weight_raster:
         weight_raster = ManagedRaster(
             weight_raster_path_band[0].encode('utf-8'),
             weight_raster_path_band[1], False)
@@ -2635,7 +2644,7 @@ def distance_to_channel_mfd(
                         # away than an adjacent one. If no weight is used
                         # then "distance" is being calculated and we account
                         # for diagonal distance.
-                        if weight_raster_path_band:
+                        if use_weight_raster:
                             weight_val = weight_raster.get(xi_n, yi_n)
                             if is_close(weight_val, weight_nodata):
                                 weight_val = 0.0
@@ -2669,7 +2678,7 @@ def distance_to_channel_mfd(
     distance_to_channel_managed_raster.close()
     channel_managed_raster.close()
     flow_dir_mfd_managed_raster.close()
-    if weight_raster_path_band:
+    if use_weight_raster:
         weight_raster.close()
     visited_managed_raster.close()
     shutil.rmtree(tmp_work_dir)
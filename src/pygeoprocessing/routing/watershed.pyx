@@ -396,8 +396,8 @@ def delineate_watersheds_d8(
     cdef int* neighbor_col = [1, 1, 0, -1, -1, -1, 0, 1]
     cdef int* neighbor_row = [0, -1, -1, -1, 0, 1, 1, 1]
     cdef queue[CoordinatePair] process_queue
-    cdef cset[CoordinatePair] process_queue_set
-    cdef CoordinatePair neighbor_pixel
+    cdef CoordinatePair current_pixel, neighbor_pixel
+    cdef int neighbor_index
     cdef int ix_min, iy_min, ix_max, iy_max
     cdef ManagedRaster scratch_managed_raster
     cdef int watersheds_created = 0
@@ -465,9 +465,8 @@ def delineate_watersheds_d8(
                 continue
 
             process_queue.push(seed)
-            process_queue_set.insert(seed)
 
-        if process_queue_set.size() == 0:
+        if process_queue.empty():
             LOGGER.debug(
                 'Outflow feature %s does not intersect any pixels with '
                 'valid flow direction. Skipping.', current_fid)
@@ -508,7 +507,6 @@ def delineate_watersheds_d8(
                     ws_id, n_cells_visited)
 
             current_pixel = process_queue.front()
-            process_queue_set.erase(current_pixel)
             process_queue.pop()
 
             scratch_managed_raster.set(current_pixel.first,
@@ -533,27 +531,23 @@ def delineate_watersheds_d8(
                 if not 0 <= neighbor_pixel.second < flow_dir_n_rows:
                     continue
 
-                # If we've already enqueued the neighbor (either it's
-                # upstream of another pixel or it's a watershed seed), we
-                # don't need to re-enqueue it.
-                if (process_queue_set.find(neighbor_pixel) !=
-                        process_queue_set.end()):
+                # Does the neighbor flow into this pixel?
+                # If not, it's not upstream of this pixel.
+                if (reverse_flow[neighbor_index] !=
+                        flow_dir_managed_raster.get(
+                            neighbor_pixel.first, neighbor_pixel.second)):
                     continue
 
                 # If the neighbor is known to be a seed, we don't need to
-                # re-enqueue it either.  Either it's been visited already (and
-                # may have upstream pixels) or it's going to be.
+                # enqueue it.  Either it's been visited already (and may have
+                # upstream pixels) or it's going to be.
                 if (seeds_in_watershed.find(neighbor_pixel) !=
                         seeds_in_watershed.end()):
                     continue
 
-                # Does the neighbor flow into this pixel?
-                # If yes, enqueue it.
-                if (reverse_flow[neighbor_index] ==
-                        flow_dir_managed_raster.get(
-                            neighbor_pixel.first, neighbor_pixel.second)):
-                    process_queue.push(neighbor_pixel)
-                    process_queue_set.insert(neighbor_pixel)
+                # A D8 pixel drains into exactly one neighbor, so any other
+                # upstream pixel is only ever enqueued once, by this pixel.
+                process_queue.push(neighbor_pixel)
 
         watersheds_created += 1
         scratch_managed_raster.close()
@@ -2,6 +2,7 @@ import os
 import shutil
 import tempfile
 import unittest
+import unittest.mock
 
 import numpy
 import numpy.testing
@@ -151,3 +152,231 @@ class KernelTests(unittest.TestCase):
             array = pygeoprocessing.raster_to_numpy_array(self.filepath)
             self.assertEqual(array.shape, (61, 61))
             self.assertEqual(set(numpy.unique(array)), {-1, 0, 1})
+
+    def test_create_distance_decay_kernel_symmetry(self):
+        """Kernels: test mirrored kernel matches per-pixel distances."""
+        import pygeoprocessing.kernels
+
+        # Large enough to span several 1024x1024 blocks.
+        max_dist = 1100.5
+        apothem = int(max_dist)
+        expected_array = numpy.hypot(
+            *numpy.mgrid[-apothem:apothem+1, -apothem:apothem+1])
+        expected_array[expected_array > max_dist] = 0
+
+        # Check both the single write used for small kernels and the strips
+        # of rows written for large kernels.
+        for max_in_memory_bytes in (2 ** 28, 0):
+            with self.subTest(max_in_memory_bytes=max_in_memory_bytes):
+                with unittest.mock.patch(
+                        'pygeoprocessing.kernels._MAX_IN_MEMORY_KERNEL_BYTES',
+                        max_in_memory_bytes):
+                    pygeoprocessing.kernels.create_distance_decay_kernel(
+                        self.filepath, lambda dist: dist,
+                        max_distance=max_dist, normalize=False)
+
+                array = pygeoprocessing.raster_to_numpy_array(self.filepath)
+                numpy.testing.assert_allclose(
+                    array, expected_array, rtol=1e-6)
+
+    def test_create_distance_decay_kernel_bounded_rows(self):
+        """Kernels: test large kernels are built from bounded row bands."""
+        import pygeoprocessing.kernels
+
+        max_dist = 300.5
+        apothem = int(max_dist)
+        max_in_memory_bytes = 2 ** 20
+        expected_array = numpy.hypot(
+            *numpy.mgrid[-apothem:apothem+1, -apothem:apothem+1])
+        expected_array[expected_array > max_dist] = 0
+        expected_array /= expected_array.sum()
+
+        with unittest.mock.patch(
+                'pygeoprocessing.kernels._MAX_IN_MEMORY_KERNEL_BYTES',
+                max_in_memory_bytes), unittest.mock.patch(
+                'pygeoprocessing.kernels._decay_quadrant_rows',
+                wraps=pygeoprocessing.kernels._decay_quadrant_rows) as rows:
+            pygeoprocessing.kernels.create_distance_decay_kernel(
+                self.filepath, lambda dist: dist,
+                max_distance=max_dist, normalize=True)
+
+        # No band of quadrant rows may be larger than the in-memory limit,
+        # so the whole quadrant is never evaluated at once.
+        self.assertTrue(rows.called)
+        for (_, _, row_start, row_stop), _ in rows.call_args_list:
+            self.assertLess(
+                (row_stop - row_start) * (apothem + 1) * 4,
+                max_in_memory_bytes)
+
+        array = pygeoprocessing.raster_to_numpy_array(self.filepath)
+        numpy.testing.assert_allclose(array, expected_array, rtol=1e-5)
+
+    def test_create_distance_decay_kernel_footprint(self):
+        """Kernels: test pixels just beyond max_distance are excluded."""
+        import pygeoprocessing.kernels
+
+        dichotomy_path = os.path.join(self.workspace, 'dichotomy.tif')
+        # These radii fall just short of the distance to a ring of pixels.
+        for max_dist, n_nonzero_pixels in [(7.07106781, 149),
+                                           (4.99999999, 69)]:
+            with self.subTest(max_dist=max_dist):
+                pygeoprocessing.kernels.create_distance_decay_kernel(
+                    self.filepath, lambda dist: numpy.ones(dist.shape),
+                    max_distance=max_dist, normalize=False)
+                array = pygeoprocessing.raster_to_numpy_array(self.filepath)
+                self.assertEqual(numpy.count_nonzero(array), n_nonzero_pixels)
+
+                pygeoprocessing.kernels.dichotomous_kernel(
+                    dichotomy_path, max_distance=max_dist, normalize=False)
+                numpy.testing.assert_array_equal(
+                    pygeoprocessing.raster_to_numpy_array(dichotomy_path),
+                    array)
+
+    def test_builtin_kernels_match_distance_decay(self):
+        """Kernels: test compiled kernels match the equivalent callables."""
+        import pygeoprocessing.kernels
+
+        max_dist = 40.5
+        expected_dist = 12
+        sigma = max_dist / 3
+        decay_path = os.path.join(self.workspace, 'decay.tif')
+        for kernel_func, kwargs, decay_function in [
+                (pygeoprocessing.kernels.dichotomous_kernel,
+                 {'max_distance': max_dist},
+                 lambda dist: numpy.ones(dist.shape)),
+                (pygeoprocessing.kernels.exponential_decay_kernel,
+                 {'max_distance': max_dist,
+                  'expected_distance': expected_dist},
+                 lambda dist: numpy.exp(-dist / expected_dist)),
+                (pygeoprocessing.kernels.linear_decay_kernel,
+                 {'max_distance': max_dist},
+                 lambda dist: (max_dist - dist) / max_dist),
+                (pygeoprocessing.kernels.normal_distribution_kernel,
+                 {'sigma': sigma, 'n_std_dev': 3},
+                 lambda dist: (1 / (2 * numpy.pi * sigma ** 2)) * numpy.exp(
+                     (-dist ** 2) / (2 * sigma ** 2)))]:
+            with self.subTest(kernel=kernel_func.__name__):
+                kernel_func(self.filepath, normalize=False, **kwargs)
+                pygeoprocessing.kernels.create_distance_decay_kernel(
+                    decay_path, decay_function, max_distance=max_dist,
+                    normalize=False)
+                numpy.testing.assert_allclose(
+                    pygeoprocessing.raster_to_numpy_array(self.filepath),
+                    pygeoprocessing.raster_to_numpy_array(decay_path),
+                    rtol=1e-5, atol=1e-7)
+
+    def test_exponential_decay_precision(self):
+        """Kernels: test exponential decay against a float64 reference."""
+        from pygeoprocessing import kernels_core
+
+        max_dist = 100.5
+        expected_dist = 5
+        quadrant, _ = kernels_core.exponential_decay_quadrant(
+            max_distance=max_dist, expected_distance=expected_dist)
+
+        apothem = int(max_dist)
+        dist = numpy.hypot(*numpy.mgrid[0:apothem+1, 0:apothem+1])
+        expected_quadrant = numpy.exp(-dist / expected_dist)
+        expected_quadrant[dist > max_dist] = 0
+
+        # Values should only differ by rounding to float32.
+        numpy.testing.assert_allclose(
+            quadrant, expected_quadrant, rtol=1e-7, atol=0)
+
+    def test_quadrant_row_bands(self):
+        """Kernels: test quadrant row bands match the whole quadrant."""
+        from pygeoprocessing import kernels_core
+
+        max_dist = 50.5
+        for quadrant_function, params in (
+                (kernels_core.dichotomous_quadrant, {}),
+                (kernels_core.exponential_decay_quadrant,
+                 {'expected_distance': 7}),
+                (kernels_core.linear_decay_quadrant, {}),
+                (kernels_core.normal_distribution_quadrant, {'sigma': 9})):
+            with self.subTest(quadrant_function=quadrant_function.__name__):
+                quadrant, kernel_sum = quadrant_function(
+                    max_distance=max_dist, **params)
+                band_sum = 0
+                for row_start in range(0, quadrant.shape[0], 7):
+                    band, band_kernel_sum = quadrant_function(
+                        max_distance=max_dist, row_start=row_start,
+                        row_stop=min(row_start + 7, quadrant.shape[0]),
+                        **params)
+                    numpy.testing.assert_array_equal(
+                        band, quadrant[row_start:row_start + 7])
+                    band_sum += band_kernel_sum
+                self.assertAlmostEqual(band_sum / kernel_sum, 1, places=9)
+
+    def test_kernel_cache(self):
+        """Kernels: test built-in kernels are copied from the kernel cache."""
+        import pygeoprocessing.kernels
+
+        cache_dir = os.path.join(self.workspace, 'cache')
+        with unittest.mock.patch.dict(os.environ, {
+                pygeoprocessing.kernels.KERNEL_CACHE_DIR_ENV: cache_dir}):
+            pygeoprocessing.kernels.normal_distribution_kernel(
+                self.filepath, sigma=10)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            # The second kernel must come from the cache, not be recomputed.
+            cached_kernel_path = os.path.join(self.workspace, 'cached.tif')
+            with unittest.mock.patch.dict(
+                    pygeoprocessing.kernels._QUADRANT_FUNCTIONS,
+                    {'gaussian': unittest.mock.Mock(
+                        side_effect=AssertionError('kernel recomputed'))}):
+                pygeoprocessing.kernels.normal_distribution_kernel(
+                    cached_kernel_path, sigma=10)
+                # Equal parameters of a different type share the same key.
+                pygeoprocessing.kernels.normal_distribution_kernel(
+                    os.path.join(self.workspace, 'float_sigma.tif'),
+                    sigma=10.0)
+
+            # A kernel with different parameters is not taken from the cache.
+            pygeoprocessing.kernels.normal_distribution_kernel(
+                os.path.join(self.workspace, 'other.tif'), sigma=5)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+        numpy.testing.assert_array_equal(
+            pygeoprocessing.raster_to_numpy_array(cached_kernel_path),
+            pygeoprocessing.raster_to_numpy_array(self.filepath))
+
+    def test_kernel_cache_virtual_filesystem(self):
+        """Kernels: test kernels on GDAL virtual filesystems aren't cached."""
+        import pygeoprocessing.kernels
+
+        cache_dir = os.path.join(self.workspace, 'cache')
+        kernel_path = '/vsimem/kernel.tif'
+        try:
+            with unittest.mock.patch.dict(os.environ, {
+                    pygeoprocessing.kernels.KERNEL_CACHE_DIR_ENV: cache_dir}):
+                pygeoprocessing.kernels.normal_distribution_kernel(
+                    kernel_path, sigma=10)
+            self.assertFalse(os.path.exists(cache_dir))
+            self.assertEqual(
+                pygeoprocessing.raster_to_numpy_array(kernel_path).shape,
+                (61, 61))
+        finally:
+            gdal.Unlink(kernel_path)
+
+    def test_kernel_cache_write_failure(self):
+        """Kernels: test a kernel is still created if it can't be cached."""
+        import pygeoprocessing.kernels
+
+        cache_dir = os.path.join(self.workspace, 'cache')
+        with unittest.mock.patch.dict(os.environ, {
+                pygeoprocessing.kernels.KERNEL_CACHE_DIR_ENV: cache_dir}):
+            with unittest.mock.patch(
+                    'pygeoprocessing.kernels.os.replace',
+                    side_effect=OSError('cache is full')):
+                with self.assertLogs(
+                        'pygeoprocessing.kernels', level='WARNING') as cm:
+                    pygeoprocessing.kernels.normal_distribution_kernel(
+                        self.filepath, sigma=10)
+
+        self.assertIn('cache is full', cm.output[0])
+        # The temporary copy is cleaned up and nothing is cached.
+        self.assertEqual(os.listdir(cache_dir), [])
+        self.assertEqual(
+            pygeoprocessing.raster_to_numpy_array(self.filepath).shape,
+            (61, 61))
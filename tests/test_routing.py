@@ -1,8 +1,10 @@
 """pygeoprocessing.routing test suite."""
+import contextlib
 import os
 import shutil
 import tempfile
 import unittest
+import uuid
 
 import numpy
 import numpy.testing
@@ -10,16 +12,267 @@ import pygeoprocessing
 import pygeoprocessing.routing
 import scipy.interpolate
 from osgeo import gdal
+from osgeo import osr
 from test_geoprocessing import _array_to_raster
 
+# The fixtures here are all much smaller than a default 256x256 block, so
+# write them as classic (not BigTIFF) GeoTiffs with a single small tile.  The
+# routing functions require power-of-two block sizes.  A tile this small
+# gains nothing from compression, so it is written uncompressed.
+_FIXTURE_CREATION_OPTIONS = (
+    'TILED=YES', 'BIGTIFF=NO', 'BLOCKXSIZE=16', 'BLOCKYSIZE=16')
+
+# A D8 flow direction raster that was created from a plateau drain dem.
+_PLATEAU_FLOW_DIR = numpy.array([
+    [2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0],
+    [4, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0],
+    [4, 4, 2, 2, 2, 2, 2, 2, 2, 0, 0],
+    [4, 4, 4, 2, 2, 2, 2, 2, 0, 0, 0],
+    [4, 4, 4, 4, 2, 2, 2, 0, 0, 0, 0],
+    [4, 4, 4, 4, 4, 2, 0, 0, 0, 0, 0],
+    [4, 4, 4, 4, 4, 6, 0, 0, 0, 0, 0],
+    [4, 4, 4, 4, 6, 6, 6, 0, 0, 0, 0],
+    [4, 4, 4, 6, 6, 6, 6, 6, 0, 0, 0],
+    [4, 4, 6, 6, 6, 6, 6, 6, 6, 0, 0],
+    [4, 6, 6, 6, 6, 6, 6, 6, 6, 6, 0]], dtype=numpy.uint8)
+
+# The channels of the plateau, taken from a manual inspection of a flow
+# accumulation run.
+_PLATEAU_CHANNEL = numpy.array([
+    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+    [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
+    [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
+    [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
+    [1, 1, 0, 0, 0, 0, 0, 0, 0, 1, 1],
+    [1, 1, 0, 0, 0, 0, 0, 0, 0, 1, 1],
+    [1, 1, 0, 0, 0, 0, 0, 0, 0, 1, 1],
+    [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
+    [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
+    [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
+    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]], dtype=numpy.uint8)
+
+# Row and column offsets of the neighbor in each D8 flow direction.
+_D8_ROW_OFFSETS = (0, -1, -1, -1, 0, 1, 1, 1)
+_D8_COL_OFFSETS = (1, 1, 0, -1, -1, -1, 0, 1)
+
+
+def _d8_downstream_paths(flow_dir_array):
+    """Yield the D8 path from each pixel to the edge of ``flow_dir_array``.
+
+    Args:
+        flow_dir_array (numpy.ndarray): a D8 flow direction array with no
+            nodata pixels or cycles.
+
+    Yields:
+        A list of the (row, col) indexes of the pixels on the downstream path
+        of each pixel, starting with the pixel itself.
+    """
+    n_rows, n_cols = flow_dir_array.shape
+    for row, col in numpy.ndindex(flow_dir_array.shape):
+        path = []
+        while 0 <= row < n_rows and 0 <= col < n_cols:
+            path.append((row, col))
+            direction = flow_dir_array[row, col]
+            row += _D8_ROW_OFFSETS[direction]
+            col += _D8_COL_OFFSETS[direction]
+        yield path
+
+
+# The D8 flow accumulation of _PLATEAU_FLOW_DIR: each pixel counts itself and
+# every pixel that drains through it.
+_PLATEAU_FLOW_ACCUM = numpy.zeros(_PLATEAU_FLOW_DIR.shape, dtype=int)
+for _path in _d8_downstream_paths(_PLATEAU_FLOW_DIR):
+    _PLATEAU_FLOW_ACCUM[tuple(zip(*_path))] += 1
+
+# The D8 distance from each pixel of _PLATEAU_FLOW_DIR to _PLATEAU_CHANNEL.
+# The plateau only drains in cardinal directions, so this is the number of
+# steps to the first channel pixel downstream.
+_PLATEAU_DISTANCE_TO_CHANNEL = numpy.zeros(_PLATEAU_FLOW_DIR.shape, dtype=int)
+for _path in _d8_downstream_paths(_PLATEAU_FLOW_DIR):
+    _PLATEAU_DISTANCE_TO_CHANNEL[_path[0]] = next(
+        n_steps for n_steps, pixel in enumerate(_path)
+        if _PLATEAU_CHANNEL[pixel])
+del _path
+
+# The MFD flow direction of a flat dem with a left-to-right central channel,
+# generated from a hand checked result.  The five rows above the channel are
+# all the same, as are the five rows below it.
+_CHANNEL_DEM_MFD_FLOW_DIR = numpy.repeat(numpy.array([
+    [1761607680] + [1178599424] * 9 + [157286400],
+    [4603904] + [983040] * 4 + [524296] + [15] * 4 + [1073741894],
+    [2400] + [17984] * 9 + [26880]], dtype=numpy.int32), (5, 1, 5), axis=0)
+
+# The MFD flow accumulation of _CHANNEL_DEM_MFD_FLOW_DIR, generated from a
+# hand-checked result.
+_CHANNEL_DEM_MFD_FLOW_ACCUM = numpy.array([
+    [1., 1., 1., 1., 1., 1., 1., 1., 1., 1., 1.],
+    [1.88571429, 2.11428571, 2., 2., 2., 2., 2., 2., 2., 2.11428571,
+     1.88571429],
+    [2.7355102, 3.23183673, 3.03265306, 3., 3., 3., 3., 3.,
+     3.03265306, 3.23183673, 2.7355102],
+    [3.56468805, 4.34574927, 4.08023324, 4.00932945, 4., 4., 4.,
+     4.00932945, 4.08023324, 4.34574927, 3.56468805],
+    [4.38045548, 5.45412012, 5.13583673, 5.02692212, 5.00266556, 5.,
+     5.00266556, 5.02692212, 5.13583673, 5.45412012, 4.38045548],
+    [60.5, 51.12681336, 39.01272503, 27.62141227, 16.519192,
+     11.00304635, 16.519192, 27.62141227, 39.01272503, 51.12681336,
+     60.5],
+    [4.38045548, 5.45412012, 5.13583673, 5.02692212, 5.00266556, 5.,
+     5.00266556, 5.02692212, 5.13583673, 5.45412012, 4.38045548],
+    [3.56468805, 4.34574927, 4.08023324, 4.00932945, 4., 4., 4.,
+     4.00932945, 4.08023324, 4.34574927, 3.56468805],
+    [2.7355102, 3.23183673, 3.03265306, 3., 3., 3., 3., 3.,
+     3.03265306, 3.23183673, 2.7355102],
+    [1.88571429, 2.11428571, 2., 2., 2., 2., 2., 2., 2., 2.11428571,
+     1.88571429],
+    [1., 1., 1., 1., 1., 1., 1., 1., 1., 1., 1.]])
+
+
+def _write_constant_raster(
+        target_path, shape, value, dtype, target_nodata=None):
+    """Write a fixture raster where every pixel has the same value.
+
+    Args:
+        target_path (string): The path to where the raster will be written.
+        shape (tuple): The (rows, cols) shape of the raster.
+        value (number): The value of every pixel.
+        dtype (numpy.dtype): The numpy datatype of the raster.
+        target_nodata (number): The nodata value of the raster, if any.
+
+    Returns:
+        The numpy array that was written.
+    """
+    array = numpy.full(shape, value, dtype=dtype)
+    _array_to_raster(
+        array, target_nodata, target_path,
+        creation_options=_FIXTURE_CREATION_OPTIONS)
+    return array
+
+
+def _read_raster_into(raster_path, target_array):
+    """Read the first band of a raster into an existing array.
+
+    Useful when a test reads the same output raster more than once.
+
+    Args:
+        raster_path (string): The path to a raster whose first band has the
+            same shape as ``target_array``.
+        target_array (numpy.ndarray): The array to read the band into.
+
+    Returns:
+        ``target_array``
+    """
+    raster = gdal.OpenEx(raster_path, gdal.OF_RASTER)
+    raster.GetRasterBand(1).ReadAsArray(buf_obj=target_array)
+    raster = None
+    return target_array
+
+
+@contextlib.contextmanager
+def _open_vector_layer(vector_path):
+    """Open the first layer of a vector for the duration of a context.
+
+    The vector is released when the context exits, even if a test assertion
+    in the context fails, so the layer must not be used after that.
+
+    Args:
+        vector_path (string): The path to a vector.
+
+    Yields:
+        The first ``ogr.Layer`` of the vector.
+    """
+    vector = gdal.OpenEx(vector_path, gdal.OF_VECTOR)
+    try:
+        yield vector.GetLayer()
+    finally:
+        vector = None
+
+
+# Undoes the GDAL settings made for this module once its tests are done.
+_MODULE_GDAL_SETTINGS = contextlib.ExitStack()
+
+
+def setUpModule():
+    """Configure GDAL for the routing tests.
+
+    GDAL errors are raised as exceptions rather than returned.  GDAL's
+    block cache is capped at 16 MB, which still holds every block of the
+    small fixtures here so that reopened rasters stay cached, without
+    letting the cache grow to its default share of system memory.  The
+    routing functions stream their rasters block by block and do not need
+    a larger cache.
+    """
+    _MODULE_GDAL_SETTINGS.enter_context(pygeoprocessing.GDALUseExceptions())
+    _MODULE_GDAL_SETTINGS.callback(gdal.SetCacheMax, gdal.GetCacheMax())
+    gdal.SetCacheMax(16 * 1024 * 1024)
+
+
+def tearDownModule():
+    """Restore the GDAL settings from before these tests."""
+    _MODULE_GDAL_SETTINGS.close()
+
 
 class TestRouting(unittest.TestCase):
     """Tests for pygeoprocessing.routing."""
+    @classmethod
+    def setUpClass(cls):
+        """Write the read-only fixture rasters shared by several tests."""
+        # These are only ever read, so keep them in GDAL's in-memory
+        # filesystem rather than on disk.
+        cls.fixture_dir = f'/vsimem/test_routing_{uuid.uuid4().hex}'
+
+        cls.plateau_flow_dir_path = f'{cls.fixture_dir}/flow_dir_plateau.tif'
+        _array_to_raster(
+            _PLATEAU_FLOW_DIR, None, cls.plateau_flow_dir_path,
+            creation_options=_FIXTURE_CREATION_OPTIONS)
+
+        cls.plateau_channel_path = f'{cls.fixture_dir}/channel_plateau.tif'
+        _array_to_raster(
+            _PLATEAU_CHANNEL, None, cls.plateau_channel_path,
+            creation_options=_FIXTURE_CREATION_OPTIONS)
+
+        # A flat dem with a left-to-right central channel.
+        channel_dem_array = numpy.zeros((11, 11), dtype=numpy.float32)
+        channel_dem_array[5, :] = -1
+        cls.channel_dem_path = f'{cls.fixture_dir}/channel_dem.tif'
+        _array_to_raster(
+            channel_dem_array, None, cls.channel_dem_path,
+            creation_options=_FIXTURE_CREATION_OPTIONS)
+
+        # The MFD flow direction of that dem and its channel, taken from a
+        # manual inspection of a flow accumulation run.
+        cls.channel_dem_mfd_flow_dir_path = (
+            f'{cls.fixture_dir}/channel_dem_mfd_flow_dir.tif')
+        _array_to_raster(
+            _CHANNEL_DEM_MFD_FLOW_DIR, None,
+            cls.channel_dem_mfd_flow_dir_path,
+            creation_options=_FIXTURE_CREATION_OPTIONS)
+
+        channel_dem_channel_array = numpy.zeros((11, 11), dtype=numpy.uint8)
+        channel_dem_channel_array[5, :] = 1
+        cls.channel_dem_channel_path = (
+            f'{cls.fixture_dir}/channel_dem_channel.tif')
+        _array_to_raster(
+            channel_dem_channel_array, None, cls.channel_dem_channel_path,
+            creation_options=_FIXTURE_CREATION_OPTIONS)
+
+        # The routing functions write their intermediate rasters to a real
+        # directory, so make one for the class and give each test its own
+        # subdirectory of it.
+        cls.class_workspace_dir = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up the shared fixture rasters and the class workspace."""
+        for filename in gdal.ReadDirRecursive(cls.fixture_dir) or []:
+            gdal.Unlink(f'{cls.fixture_dir}/{filename}')
+        shutil.rmtree(cls.class_workspace_dir)
+
     def setUp(self):
-        """Create a temporary workspace that's deleted later."""
-        self.workspace_dir = tempfile.mkdtemp()
-        if not os.path.exists(self.workspace_dir):
-            os.makedirs(self.workspace_dir)
+        """Create a workspace for the test that's deleted later."""
+        self.workspace_dir = os.path.join(
+            self.class_workspace_dir, self._testMethodName)
+        os.mkdir(self.workspace_dir)
 
     def tearDown(self):
         """Clean up remaining files."""
@@ -41,7 +294,6 @@ class TestRouting(unittest.TestCase):
 
     def test_pit_filling_large_border(self):
         """PGP.routing: test pitfilling with large nodata border."""
-        os.makedirs(self.workspace_dir, exist_ok=True)
         base_path = os.path.join(self.workspace_dir, 'base.tif')
         nodata = -1.0
         n = 30
@@ -144,7 +396,7 @@ class TestRouting(unittest.TestCase):
             (base_path, 1), fill_path, working_dir=self.workspace_dir)
 
         result_array = pygeoprocessing.raster_to_numpy_array(fill_path)
-        self.assertEqual(result_array.dtype, numpy.int32)
+        self.assertEqual(result_array.dtype.char, 'i')
         # the expected result is that the pit is filled in
         dem_array[3:8, 3:8] = 0.0
         numpy.testing.assert_almost_equal(result_array, dem_array)
@@ -164,7 +416,7 @@ class TestRouting(unittest.TestCase):
             (base_path, 1), fill_path, working_dir=self.workspace_dir)
 
         result_array = pygeoprocessing.raster_to_numpy_array(fill_path)
-        self.assertEqual(result_array.dtype, numpy.float32)
+        self.assertEqual(result_array.dtype.char, 'f')
         # the expected result is that the pit is filled in
         dem_array[3:8, 3:8] = 0.0
         numpy.testing.assert_almost_equal(result_array, dem_array)
@@ -184,21 +436,9 @@ class TestRouting(unittest.TestCase):
 
         flow_array = pygeoprocessing.raster_to_numpy_array(
             target_flow_dir_path)
-        self.assertEqual(flow_array.dtype, numpy.uint8)
-        # this is a regression result saved by hand
-        expected_result = numpy.array([
-            [2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0],
-            [4, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0],
-            [4, 4, 2, 2, 2, 2, 2, 2, 2, 0, 0],
-            [4, 4, 4, 2, 2, 2, 2, 2, 0, 0, 0],
-            [4, 4, 4, 4, 2, 2, 2, 0, 0, 0, 0],
-            [4, 4, 4, 4, 4, 2, 0, 0, 0, 0, 0],
-            [4, 4, 4, 4, 4, 6, 0, 0, 0, 0, 0],
-            [4, 4, 4, 4, 6, 6, 6, 0, 0, 0, 0],
-            [4, 4, 4, 6, 6, 6, 6, 6, 0, 0, 0],
-            [4, 4, 6, 6, 6, 6, 6, 6, 6, 0, 0],
-            [4, 6, 6, 6, 6, 6, 6, 6, 6, 6, 0]])
-        numpy.testing.assert_almost_equal(flow_array, expected_result)
+        self.assertEqual(flow_array.dtype.char, 'B')
+        expected_result = _PLATEAU_FLOW_DIR
+        numpy.testing.assert_array_equal(flow_array, expected_result)
 
     def test_invalid_mode_detect_outlets(self):
         """PGP.routing: ensure invalid mode caught when detecting outlets."""
@@ -346,139 +586,75 @@ class TestRouting(unittest.TestCase):
         # We know the expected outlets because we constructed them above
         self.assertEqual(outlet_ij_set, expected_outlet_ij_set)
 
-    def test_flow_accum_d8(self):
-        """PGP.routing: test D8 flow accum."""
-        # this was generated from a pre-calculated plateau drain dem
-        flow_dir_array = numpy.array([
-            [2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0],
-            [4, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0],
-            [4, 4, 2, 2, 2, 2, 2, 2, 2, 0, 0],
-            [4, 4, 4, 2, 2, 2, 2, 2, 0, 0, 0],
-            [4, 4, 4, 4, 2, 2, 2, 0, 0, 0, 0],
-            [4, 4, 4, 4, 4, 2, 0, 0, 0, 0, 0],
-            [4, 4, 4, 4, 4, 6, 0, 0, 0, 0, 0],
-            [4, 4, 4, 4, 6, 6, 6, 0, 0, 0, 0],
-            [4, 4, 4, 6, 6, 6, 6, 6, 0, 0, 0],
-            [4, 4, 6, 6, 6, 6, 6, 6, 6, 0, 0],
-            [4, 6, 6, 6, 6, 6, 6, 6, 6, 6, 0]], dtype=numpy.uint8)
-
-        flow_dir_path = os.path.join(self.workspace_dir, 'flow_dir.tif')
-        _array_to_raster(flow_dir_array, None, flow_dir_path)
-
-        target_flow_accum_path = os.path.join(
-            self.workspace_dir, 'flow_accum.tif')
-
-        pygeoprocessing.routing.flow_accumulation_d8(
-            (flow_dir_path, 1), target_flow_accum_path)
-
-        flow_accum_array = pygeoprocessing.raster_to_numpy_array(
-            target_flow_accum_path)
-        self.assertEqual(flow_accum_array.dtype, numpy.float64)
-
-        # this is a regression result saved by hand
-        expected_result = numpy.array(
-            [[1, 2, 3, 4, 5, 6, 5, 4, 3, 2, 1],
-             [1, 1, 2, 3, 4, 5, 4, 3, 2, 1, 1],
-             [2, 1, 1, 2, 3, 4, 3, 2, 1, 1, 2],
-             [3, 2, 1, 1, 2, 3, 2, 1, 1, 2, 3],
-             [4, 3, 2, 1, 1, 2, 1, 1, 2, 3, 4],
-             [5, 4, 3, 2, 1, 1, 1, 2, 3, 4, 5],
-             [5, 4, 3, 2, 1, 1, 1, 2, 3, 4, 5],
-             [4, 3, 2, 1, 1, 2, 1, 1, 2, 3, 4],
-             [3, 2, 1, 1, 2, 3, 2, 1, 1, 2, 3],
-             [2, 1, 1, 2, 3, 4, 3, 2, 1, 1, 2],
-             [1, 1, 2, 3, 4, 5, 4, 3, 2, 1, 1]])
-
-        numpy.testing.assert_almost_equal(flow_accum_array, expected_result)
-
-    def test_flow_accum_d8_flow_weights(self):
-        """PGP.routing: test D8 flow accum with flow weights."""
-        # this was generated from a pre-calculated plateau drain dem
-        flow_dir_array = numpy.array([
-            [2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0],
-            [4, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0],
-            [4, 4, 2, 2, 2, 2, 2, 2, 2, 0, 0],
-            [4, 4, 4, 2, 2, 2, 2, 2, 0, 0, 0],
-            [4, 4, 4, 4, 2, 2, 2, 0, 0, 0, 0],
-            [4, 4, 4, 4, 4, 2, 0, 0, 0, 0, 0],
-            [4, 4, 4, 4, 4, 6, 0, 0, 0, 0, 0],
-            [4, 4, 4, 4, 6, 6, 6, 0, 0, 0, 0],
-            [4, 4, 4, 6, 6, 6, 6, 6, 0, 0, 0],
-            [4, 4, 6, 6, 6, 6, 6, 6, 6, 0, 0],
-            [4, 6, 6, 6, 6, 6, 6, 6, 6, 6, 0]], dtype=numpy.uint8)
-
-        flow_dir_path = os.path.join(self.workspace_dir, 'flow_dir.tif')
-        _array_to_raster(flow_dir_array, None, flow_dir_path)
-
-        flow_weight_raster_path = os.path.join(
-            self.workspace_dir, 'flow_weights.tif')
-        flow_weight_array = numpy.empty(
-            flow_dir_array.shape, dtype=numpy.float32)
-        flow_weight_constant = 2.7
-        flow_weight_array[:] = flow_weight_constant
-        _array_to_raster(flow_weight_array, None, flow_weight_raster_path)
+    def test_plateau_expected_results(self):
+        """PGP.routing: test derived plateau results match hand-saved ones."""
+        # The D8 tests use the plateau results derived from the flow
+        # directions, so check them once against the results saved by hand.
+        numpy.testing.assert_array_equal(_PLATEAU_FLOW_ACCUM, [
+            [1, 2, 3, 4, 5, 6, 5, 4, 3, 2, 1],
+            [1, 1, 2, 3, 4, 5, 4, 3, 2, 1, 1],
+            [2, 1, 1, 2, 3, 4, 3, 2, 1, 1, 2],
+            [3, 2, 1, 1, 2, 3, 2, 1, 1, 2, 3],
+            [4, 3, 2, 1, 1, 2, 1, 1, 2, 3, 4],
+            [5, 4, 3, 2, 1, 1, 1, 2, 3, 4, 5],
+            [5, 4, 3, 2, 1, 1, 1, 2, 3, 4, 5],
+            [4, 3, 2, 1, 1, 2, 1, 1, 2, 3, 4],
+            [3, 2, 1, 1, 2, 3, 2, 1, 1, 2, 3],
+            [2, 1, 1, 2, 3, 4, 3, 2, 1, 1, 2],
+            [1, 1, 2, 3, 4, 5, 4, 3, 2, 1, 1]])
+        numpy.testing.assert_array_equal(_PLATEAU_DISTANCE_TO_CHANNEL, [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0],
+            [0, 1, 2, 2, 2, 2, 2, 2, 2, 1, 0],
+            [0, 1, 2, 3, 3, 3, 3, 3, 2, 1, 0],
+            [0, 0, 1, 2, 4, 4, 4, 2, 1, 0, 0],
+            [0, 0, 1, 2, 3, 5, 3, 2, 1, 0, 0],
+            [0, 0, 1, 2, 3, 4, 3, 2, 1, 0, 0],
+            [0, 1, 2, 3, 3, 3, 3, 3, 2, 1, 0],
+            [0, 1, 2, 2, 2, 2, 2, 2, 2, 1, 0],
+            [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]])
 
+    def test_flow_accum_d8(self):
+        """PGP.routing: test D8 flow accum with and without flow weights."""
         target_flow_accum_path = os.path.join(
             self.workspace_dir, 'flow_accum.tif')
 
-        pygeoprocessing.routing.flow_accumulation_d8(
-            (flow_dir_path, 1), target_flow_accum_path,
-            weight_raster_path_band=(flow_weight_raster_path, 1))
-
-        flow_accum_array = pygeoprocessing.raster_to_numpy_array(
-            target_flow_accum_path)
-        self.assertEqual(flow_accum_array.dtype, numpy.float64)
-
-        # this is a regression result saved by hand from a simple run but
-        # multiplied by the flow weight constant so we know flow weights work.
-        expected_result = flow_weight_constant * numpy.array(
-            [[1, 2, 3, 4, 5, 6, 5, 4, 3, 2, 1],
-             [1, 1, 2, 3, 4, 5, 4, 3, 2, 1, 1],
-             [2, 1, 1, 2, 3, 4, 3, 2, 1, 1, 2],
-             [3, 2, 1, 1, 2, 3, 2, 1, 1, 2, 3],
-             [4, 3, 2, 1, 1, 2, 1, 1, 2, 3, 4],
-             [5, 4, 3, 2, 1, 1, 1, 2, 3, 4, 5],
-             [5, 4, 3, 2, 1, 1, 1, 2, 3, 4, 5],
-             [4, 3, 2, 1, 1, 2, 1, 1, 2, 3, 4],
-             [3, 2, 1, 1, 2, 3, 2, 1, 1, 2, 3],
-             [2, 1, 1, 2, 3, 4, 3, 2, 1, 1, 2],
-             [1, 1, 2, 3, 4, 5, 4, 3, 2, 1, 1]], dtype=numpy.float64)
-
-        numpy.testing.assert_almost_equal(
-            flow_accum_array, expected_result, 6)
-
-        pygeoprocessing.routing.flow_accumulation_d8(
-            (flow_dir_path, 1), target_flow_accum_path,
-            weight_raster_path_band=(flow_weight_raster_path, 1))
-
-        flow_accum_array = pygeoprocessing.raster_to_numpy_array(
-            target_flow_accum_path)
-        self.assertEqual(flow_accum_array.dtype, numpy.float64)
-
-        # this is a regression result saved by hand from a simple run but
-        # multiplied by the flow weight constant so we know flow weights work.
-        zero_array = numpy.zeros(flow_dir_array.shape, dtype=numpy.float32)
-        zero_raster_path = os.path.join(self.workspace_dir, 'zero.tif')
-        _array_to_raster(zero_array, None, zero_raster_path)
-
-        pygeoprocessing.routing.flow_accumulation_d8(
-            (flow_dir_path, 1), target_flow_accum_path,
-            weight_raster_path_band=(zero_raster_path, 1))
-        flow_accum_array = pygeoprocessing.raster_to_numpy_array(
-            target_flow_accum_path)
-        self.assertEqual(flow_accum_array.dtype, numpy.float64)
-
-        numpy.testing.assert_almost_equal(flow_accum_array, zero_array, 6)
+        # The unweighted result is a regression result saved by hand.  With a
+        # constant flow weight the result is scaled by that weight, so we
+        # know flow weights work, whether the weights are floats or integers.
+        # Each run writes over the previous result.
+        for flow_weight, weight_dtype in (
+                (None, None), (2.7, numpy.float32), (0, numpy.float32),
+                (3, numpy.int32)):
+            with self.subTest(flow_weight=flow_weight, dtype=weight_dtype):
+                if flow_weight is None:
+                    weight_raster_path_band = None
+                    expected_result = _PLATEAU_FLOW_ACCUM
+                else:
+                    flow_weight_raster_path = os.path.join(
+                        self.workspace_dir,
+                        f'flow_weights_{flow_weight}_'
+                        f'{numpy.dtype(weight_dtype).name}.tif')
+                    _write_constant_raster(
+                        flow_weight_raster_path, _PLATEAU_FLOW_DIR.shape,
+                        flow_weight, weight_dtype)
+                    weight_raster_path_band = (flow_weight_raster_path, 1)
+                    expected_result = flow_weight * _PLATEAU_FLOW_ACCUM
+
+                pygeoprocessing.routing.flow_accumulation_d8(
+                    (self.plateau_flow_dir_path, 1), target_flow_accum_path,
+                    weight_raster_path_band=weight_raster_path_band)
+
+                flow_accum_array = pygeoprocessing.raster_to_numpy_array(
+                    target_flow_accum_path)
+                self.assertEqual(flow_accum_array.dtype.char, 'd')
+                numpy.testing.assert_allclose(
+                    flow_accum_array, expected_result, rtol=1e-6)
 
     def test_flow_dir_mfd(self):
         """PGP.routing: test multiple flow dir."""
-        dem_path = os.path.join(self.workspace_dir, 'dem.tif')
-        # this makes a flat raster with a left-to-right central channel
-        dem_array = numpy.zeros((11, 11))
-        dem_array[5, :] = -1
-
-        _array_to_raster(dem_array, None, dem_path)
-
+        dem_path = self.channel_dem_path
         target_flow_dir_path = os.path.join(
             self.workspace_dir, 'flow_dir.tif')
 
@@ -487,49 +663,15 @@ class TestRouting(unittest.TestCase):
             working_dir=self.workspace_dir)
 
         flow_array = pygeoprocessing.raster_to_numpy_array(target_flow_dir_path)
-        self.assertEqual(flow_array.dtype, numpy.int32)
-
-        # this was generated from a hand checked result
-        expected_result = numpy.array([
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [4603904, 983040, 983040, 983040, 983040, 524296, 15, 15, 15, 15,
-             1073741894],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             17984, 26880],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             17984, 26880],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             17984, 26880],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             17984, 26880],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             17984, 26880]])
-
-        numpy.testing.assert_almost_equal(flow_array, expected_result)
+        self.assertEqual(flow_array.dtype.char, 'i')
+
+        expected_result = _CHANNEL_DEM_MFD_FLOW_DIR
+
+        numpy.testing.assert_array_equal(flow_array, expected_result)
 
     def test_flow_accum_mfd(self):
         """PGP.routing: test flow accumulation for multiple flow."""
-        driver = gdal.GetDriverByName('GTiff')
-        n = 11
-        dem_path = os.path.join(self.workspace_dir, 'dem.tif')
-        dem_array = numpy.zeros((n, n), dtype=numpy.float32)
-        dem_array[int(n/2), :] = -1
-        _array_to_raster(dem_array, None, dem_path)
-
+        dem_path = self.channel_dem_path
         flow_dir_path = os.path.join(self.workspace_dir, 'flow_dir.tif')
         pygeoprocessing.routing.flow_dir_mfd(
             (dem_path, 1), flow_dir_path,
@@ -543,128 +685,158 @@ class TestRouting(unittest.TestCase):
 
         flow_array = pygeoprocessing.raster_to_numpy_array(
             target_flow_accum_path)
-        self.assertEqual(flow_array.dtype, numpy.float64)
-
-        # this was generated from a hand-checked result
-        expected_result = numpy.array([
-            [1., 1., 1., 1., 1., 1., 1., 1., 1., 1., 1.],
-            [1.88571429, 2.11428571, 2., 2., 2., 2., 2., 2., 2., 2.11428571,
-             1.88571429],
-            [2.7355102, 3.23183673, 3.03265306, 3., 3., 3., 3., 3.,
-             3.03265306, 3.23183673, 2.7355102],
-            [3.56468805, 4.34574927, 4.08023324, 4.00932945, 4., 4., 4.,
-             4.00932945, 4.08023324, 4.34574927, 3.56468805],
-            [4.38045548, 5.45412012, 5.13583673, 5.02692212, 5.00266556, 5.,
-             5.00266556, 5.02692212, 5.13583673, 5.45412012, 4.38045548],
-            [60.5, 51.12681336, 39.01272503, 27.62141227, 16.519192,
-             11.00304635, 16.519192, 27.62141227, 39.01272503, 51.12681336,
-             60.5],
-            [4.38045548, 5.45412012, 5.13583673, 5.02692212, 5.00266556, 5.,
-             5.00266556, 5.02692212, 5.13583673, 5.45412012, 4.38045548],
-            [3.56468805, 4.34574927, 4.08023324, 4.00932945, 4., 4., 4.,
-             4.00932945, 4.08023324, 4.34574927, 3.56468805],
-            [2.7355102, 3.23183673, 3.03265306, 3., 3., 3., 3., 3.,
-             3.03265306, 3.23183673, 2.7355102],
-            [1.88571429, 2.11428571, 2., 2., 2., 2., 2., 2., 2., 2.11428571,
-             1.88571429],
-            [1., 1., 1., 1., 1., 1., 1., 1., 1., 1., 1.]])
-
-        numpy.testing.assert_almost_equal(flow_array, expected_result)
+        self.assertEqual(flow_array.dtype.char, 'd')
+
+        expected_result = _CHANNEL_DEM_MFD_FLOW_ACCUM
+
+        numpy.testing.assert_allclose(flow_array, expected_result, rtol=1e-6)
 
     def test_flow_accum_mfd_with_weights(self):
         """PGP.routing: test flow accum for mfd with weights."""
         n = 11
-        dem_raster_path = os.path.join(self.workspace_dir, 'dem.tif')
-        dem_array = numpy.zeros((n, n), dtype=numpy.float32)
-        dem_array[int(n/2), :] = -1
-
-        _array_to_raster(dem_array, None, dem_raster_path)
-
+        dem_raster_path = self.channel_dem_path
         flow_dir_path = os.path.join(self.workspace_dir, 'flow_dir.tif')
         pygeoprocessing.routing.flow_dir_mfd(
             (dem_raster_path, 1), flow_dir_path,
             working_dir=self.workspace_dir)
 
-        flow_weight_raster_path = os.path.join(
-            self.workspace_dir, 'flow_weights.tif')
-        flow_weight_array = numpy.empty((n, n))
-        flow_weight_constant = 2.7
-        flow_weight_array[:] = flow_weight_constant
-        pygeoprocessing.new_raster_from_base(
-            flow_dir_path, flow_weight_raster_path, gdal.GDT_Float32,
-            [-1.0])
-        flow_weight_raster = gdal.OpenEx(
-            flow_weight_raster_path, gdal.OF_RASTER | gdal.GA_Update)
-        flow_weight_band = flow_weight_raster.GetRasterBand(1)
-        flow_weight_band.WriteArray(flow_weight_array)
-        flow_weight_band.FlushCache()
-        flow_weight_band = None
-        flow_weight_raster = None
-
         target_flow_accum_path = os.path.join(
             self.workspace_dir, 'flow_accum_mfd.tif')
 
-        pygeoprocessing.routing.flow_accumulation_mfd(
-            (flow_dir_path, 1), target_flow_accum_path,
-            weight_raster_path_band=(flow_weight_raster_path, 1))
-
-        flow_array = pygeoprocessing.raster_to_numpy_array(
-            target_flow_accum_path)
-        self.assertEqual(flow_array.dtype, numpy.float64)
-
-        # this was generated from a hand-checked result with flow weight of
-        # 1, so the result should be twice that since we have flow weights
-        # of 2.
-        expected_result = flow_weight_constant * numpy.array([
-            [1., 1., 1., 1., 1., 1., 1., 1., 1., 1., 1.],
-            [1.88571429, 2.11428571, 2., 2., 2., 2., 2., 2., 2., 2.11428571,
-             1.88571429],
-            [2.7355102, 3.23183673, 3.03265306, 3., 3., 3., 3., 3.,
-             3.03265306, 3.23183673, 2.7355102],
-            [3.56468805, 4.34574927, 4.08023324, 4.00932945, 4., 4., 4.,
-             4.00932945, 4.08023324, 4.34574927, 3.56468805],
-            [4.38045548, 5.45412012, 5.13583673, 5.02692212, 5.00266556, 5.,
-             5.00266556, 5.02692212, 5.13583673, 5.45412012, 4.38045548],
-            [60.5, 51.12681336, 39.01272503, 27.62141227, 16.519192,
-             11.00304635, 16.519192, 27.62141227, 39.01272503, 51.12681336,
-             60.5],
-            [4.38045548, 5.45412012, 5.13583673, 5.02692212, 5.00266556, 5.,
-             5.00266556, 5.02692212, 5.13583673, 5.45412012, 4.38045548],
-            [3.56468805, 4.34574927, 4.08023324, 4.00932945, 4., 4., 4.,
-             4.00932945, 4.08023324, 4.34574927, 3.56468805],
-            [2.7355102, 3.23183673, 3.03265306, 3., 3., 3., 3., 3.,
-             3.03265306, 3.23183673, 2.7355102],
-            [1.88571429, 2.11428571, 2., 2., 2., 2., 2., 2., 2., 2.11428571,
-             1.88571429],
-            [1., 1., 1., 1., 1., 1., 1., 1., 1., 1., 1.]])
-
-        numpy.testing.assert_allclose(flow_array, expected_result, rtol=1e-6)
+        # Check both float and integer weights.  Each run writes over the
+        # previous result.
+        for flow_weight_constant, weight_dtype in (
+                (2.7, numpy.float32), (3, numpy.int32)):
+            with self.subTest(dtype=weight_dtype):
+                flow_weight_raster_path = os.path.join(
+                    self.workspace_dir,
+                    f'flow_weights_{numpy.dtype(weight_dtype).name}.tif')
+                _write_constant_raster(
+                    flow_weight_raster_path, (n, n), flow_weight_constant,
+                    weight_dtype, target_nodata=-1)
+
+                pygeoprocessing.routing.flow_accumulation_mfd(
+                    (flow_dir_path, 1), target_flow_accum_path,
+                    weight_raster_path_band=(flow_weight_raster_path, 1))
+
+                flow_array = pygeoprocessing.raster_to_numpy_array(
+                    target_flow_accum_path)
+                self.assertEqual(flow_array.dtype.char, 'd')
+
+                # this was generated from a hand-checked result with flow
+                # weight of 1, so the result should be scaled by the
+                # constant flow weight.
+                expected_result = (
+                    flow_weight_constant * _CHANNEL_DEM_MFD_FLOW_ACCUM)
+
+                numpy.testing.assert_allclose(
+                    flow_array, expected_result, rtol=1e-6)
 
         # try with zero weights
-        zero_array = numpy.zeros(expected_result.shape, dtype=numpy.float32)
         zero_raster_path = os.path.join(self.workspace_dir, 'zero.tif')
-
-        _array_to_raster(zero_array, None, zero_raster_path)
+        zero_array = _write_constant_raster(
+            zero_raster_path, (n, n), 0, numpy.float32)
 
         pygeoprocessing.routing.flow_accumulation_mfd(
             (flow_dir_path, 1), target_flow_accum_path,
             weight_raster_path_band=(zero_raster_path, 1))
         flow_accum_array = pygeoprocessing.raster_to_numpy_array(
             target_flow_accum_path)
-        self.assertEqual(flow_accum_array.dtype, numpy.float64)
-
-        numpy.testing.assert_almost_equal(
-            numpy.sum(flow_accum_array), numpy.sum(zero_array), 6)
+        self.assertEqual(flow_accum_array.dtype.char, 'd')
+
+        numpy.testing.assert_array_equal(flow_accum_array, zero_array)
+
+    def test_flow_accum_block_cache_eviction(self):
+        """PGP.routing: test flow accum on more blocks than are cached."""
+        # A single D8 path that snakes back and forth across the raster, so
+        # that each row of the path passes through more 16x16 blocks than a
+        # managed raster caches (64).  Blocks of the flow accumulation are
+        # written, evicted while dirty, then read back and written again.
+        n_rows, n_cols = 48, 16 * 80
+        rows, cols = numpy.indices((n_rows, n_cols))
+        d8_flow_dir_array = numpy.where(rows % 2 == 0, 0, 4).astype(
+            numpy.uint8)
+        d8_flow_dir_array[:, [0, -1]] = 6
+        d8_flow_dir_array[0::2, 0] = 0
+        d8_flow_dir_array[1::2, -1] = 4
+        expected_result = 1 + rows * n_cols + numpy.where(
+            rows % 2 == 0, cols, n_cols - 1 - cols)
+        self._assert_flow_accum_d8_and_mfd(
+            d8_flow_dir_array, None, expected_result)
+
+    def test_flow_accum_alternating_blocks(self):
+        """PGP.routing: test flow accum alternating between two blocks."""
+        # A single D8 path that zigzags across the boundary between the first
+        # two 16x16 block columns, so that every step of the upstream walk
+        # reads and writes a different block than the step before.
+        flow_dir_nodata = 128
+        n_rows = 40
+        d8_flow_dir_array = numpy.full(
+            (n_rows, 32), flow_dir_nodata, dtype=numpy.uint8)
+        d8_flow_dir_array[:, 15] = 0
+        d8_flow_dir_array[:, 16] = 5
+        expected_result = numpy.full(d8_flow_dir_array.shape, numpy.nan)
+        expected_result[:, 15] = numpy.arange(1, 2 * n_rows, 2)
+        expected_result[:, 16] = numpy.arange(2, 2 * n_rows + 1, 2)
+        self._assert_flow_accum_d8_and_mfd(
+            d8_flow_dir_array, flow_dir_nodata, expected_result)
+
+    def _assert_flow_accum_d8_and_mfd(
+            self, d8_flow_dir_array, flow_dir_nodata, expected_result):
+        """Check D8 and MFD flow accumulation of a single-direction raster.
+
+        All rasters are written with 16x16 blocks.
+
+        Args:
+            d8_flow_dir_array (numpy.ndarray): A uint8 D8 flow direction
+                array.
+            flow_dir_nodata (int): The nodata value of
+                ``d8_flow_dir_array``, or ``None``.
+            expected_result (numpy.ndarray): The expected flow accumulation,
+                where nodata pixels are NaN.
+
+        Returns:
+            ``None``
+        """
+        valid_mask = ~numpy.isnan(expected_result)
+        # The MFD direction with all of its flow in the D8 direction.
+        mfd_flow_dir_array = numpy.where(
+            valid_mask,
+            numpy.left_shift(1, 4 * d8_flow_dir_array.astype(numpy.int32)),
+            0).astype(numpy.int32)
+        for flow_accumulation, flow_dir_array, nodata in (
+                (pygeoprocessing.routing.flow_accumulation_d8,
+                 d8_flow_dir_array, flow_dir_nodata),
+                (pygeoprocessing.routing.flow_accumulation_mfd,
+                 mfd_flow_dir_array, 0)):
+            with self.subTest(flow_accumulation=flow_accumulation.__name__):
+                flow_dir_path = os.path.join(
+                    self.workspace_dir,
+                    f'{flow_accumulation.__name__}_flow_dir.tif')
+                _array_to_raster(
+                    flow_dir_array, nodata, flow_dir_path,
+                    creation_options=_FIXTURE_CREATION_OPTIONS)
+                target_flow_accum_path = os.path.join(
+                    self.workspace_dir,
+                    f'{flow_accumulation.__name__}_flow_accum.tif')
+                flow_accumulation(
+                    (flow_dir_path, 1), target_flow_accum_path,
+                    raster_driver_creation_tuple=(
+                        'GTiff', _FIXTURE_CREATION_OPTIONS))
+
+                flow_accum_array = pygeoprocessing.raster_to_numpy_array(
+                    target_flow_accum_path)
+                flow_accum_nodata = pygeoprocessing.get_raster_info(
+                    target_flow_accum_path)['nodata'][0]
+                numpy.testing.assert_array_equal(
+                    flow_accum_array[valid_mask],
+                    expected_result[valid_mask])
+                numpy.testing.assert_array_equal(
+                    flow_accum_array[~valid_mask], flow_accum_nodata)
 
     def test_extract_streams_mfd(self):
         """PGP.routing: stream extraction on multiple flow direction."""
-        n = 11
-        dem_path = os.path.join(self.workspace_dir, 'dem.tif')
-        dem_array = numpy.zeros((n, n), dtype=numpy.float32)
-        dem_array[int(n/2), :] = -1
-
-        _array_to_raster(dem_array, None, dem_path)
-
+        dem_path = self.channel_dem_path
         flow_dir_path = os.path.join(self.workspace_dir, 'flow_dir.tif')
         pygeoprocessing.routing.flow_dir_mfd(
             (dem_path, 1), flow_dir_path)
@@ -695,43 +867,12 @@ class TestRouting(unittest.TestCase):
              [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
              [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]])
 
-        numpy.testing.assert_almost_equal(stream_array, expected_stream_array)
+        numpy.testing.assert_array_equal(stream_array, expected_stream_array)
 
     def test_distance_to_channel_d8(self):
         """PGP.routing: test distance to channel D8."""
-        flow_dir_d8_path = os.path.join(self.workspace_dir, 'flow_dir.d8_tif')
-
-        # this is a flow direction raster that was created from a plateau drain
-        flow_dir_d8_array = numpy.array([
-            [2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0],
-            [4, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0],
-            [4, 4, 2, 2, 2, 2, 2, 2, 2, 0, 0],
-            [4, 4, 4, 2, 2, 2, 2, 2, 0, 0, 0],
-            [4, 4, 4, 4, 2, 2, 2, 0, 0, 0, 0],
-            [4, 4, 4, 4, 4, 2, 0, 0, 0, 0, 0],
-            [4, 4, 4, 4, 4, 6, 0, 0, 0, 0, 0],
-            [4, 4, 4, 4, 6, 6, 6, 0, 0, 0, 0],
-            [4, 4, 4, 6, 6, 6, 6, 6, 0, 0, 0],
-            [4, 4, 6, 6, 6, 6, 6, 6, 6, 0, 0],
-            [4, 6, 6, 6, 6, 6, 6, 6, 6, 6, 0]], dtype=numpy.uint8)
-
-        _array_to_raster(flow_dir_d8_array, None, flow_dir_d8_path)
-
-        # taken from a manual inspection of a flow accumulation run
-        channel_path = os.path.join(self.workspace_dir, 'channel.tif')
-        channel_array = numpy.array(
-            [[1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-             [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-             [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-             [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-             [1, 1, 0, 0, 0, 0, 0, 0, 0, 1, 1],
-             [1, 1, 0, 0, 0, 0, 0, 0, 0, 1, 1],
-             [1, 1, 0, 0, 0, 0, 0, 0, 0, 1, 1],
-             [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-             [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-             [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-             [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]], dtype=numpy.uint8)
-        _array_to_raster(channel_array, None, channel_path)
+        flow_dir_d8_path = self.plateau_flow_dir_path
+        channel_path = self.plateau_channel_path
 
         distance_to_channel_d8_path = os.path.join(
             self.workspace_dir, 'distance_to_channel_d8.tif')
@@ -742,164 +883,75 @@ class TestRouting(unittest.TestCase):
         distance_to_channel_d8_array = pygeoprocessing.raster_to_numpy_array(
             distance_to_channel_d8_path)
 
-        expected_result = numpy.array(
-            [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0],
-             [0, 1, 2, 2, 2, 2, 2, 2, 2, 1, 0],
-             [0, 1, 2, 3, 3, 3, 3, 3, 2, 1, 0],
-             [0, 0, 1, 2, 4, 4, 4, 2, 1, 0, 0],
-             [0, 0, 1, 2, 3, 5, 3, 2, 1, 0, 0],
-             [0, 0, 1, 2, 3, 4, 3, 2, 1, 0, 0],
-             [0, 1, 2, 3, 3, 3, 3, 3, 2, 1, 0],
-             [0, 1, 2, 2, 2, 2, 2, 2, 2, 1, 0],
-             [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]])
+        expected_result = _PLATEAU_DISTANCE_TO_CHANNEL
 
-        numpy.testing.assert_almost_equal(
+        numpy.testing.assert_array_equal(
             distance_to_channel_d8_array, expected_result)
 
     def test_distance_to_channel_d8_with_weights(self):
         """PGP.routing: test distance to channel D8."""
-        driver = gdal.GetDriverByName('GTiff')
-        flow_dir_d8_path = os.path.join(self.workspace_dir, 'flow_dir.d8_tif')
-
-        # this is a flow direction raster that was created from a plateau drain
-        flow_dir_d8_array = numpy.array([
-            [2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0],
-            [4, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0],
-            [4, 4, 2, 2, 2, 2, 2, 2, 2, 0, 0],
-            [4, 4, 4, 2, 2, 2, 2, 2, 0, 0, 0],
-            [4, 4, 4, 4, 2, 2, 2, 0, 0, 0, 0],
-            [4, 4, 4, 4, 4, 2, 0, 0, 0, 0, 0],
-            [4, 4, 4, 4, 4, 6, 0, 0, 0, 0, 0],
-            [4, 4, 4, 4, 6, 6, 6, 0, 0, 0, 0],
-            [4, 4, 4, 6, 6, 6, 6, 6, 0, 0, 0],
-            [4, 4, 6, 6, 6, 6, 6, 6, 6, 0, 0],
-            [4, 6, 6, 6, 6, 6, 6, 6, 6, 6, 0]], dtype=numpy.uint8)
-        _array_to_raster(flow_dir_d8_array, None, flow_dir_d8_path)
-
-        # taken from a manual inspection of a flow accumulation run
-        channel_path = os.path.join(self.workspace_dir, 'channel.tif')
-        channel_array = numpy.array(
-            [[1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-             [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-             [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-             [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-             [1, 1, 0, 0, 0, 0, 0, 0, 0, 1, 1],
-             [1, 1, 0, 0, 0, 0, 0, 0, 0, 1, 1],
-             [1, 1, 0, 0, 0, 0, 0, 0, 0, 1, 1],
-             [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-             [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-             [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-             [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]], dtype=numpy.uint8)
-
-        _array_to_raster(channel_array, None, channel_path)
-
-        flow_weight_array = numpy.empty(
-            flow_dir_d8_array.shape, dtype=numpy.int32)
-        weight_factor = 2.0
-        flow_weight_array[:] = weight_factor
-        flow_dir_d8_weight_path = os.path.join(
-            self.workspace_dir, 'flow_dir_d8.tif')
-
-        _array_to_raster(flow_weight_array, None, flow_dir_d8_weight_path)
+        flow_dir_d8_path = self.plateau_flow_dir_path
+        channel_path = self.plateau_channel_path
 
+        weight_factor = 2.0
+        expected_result = weight_factor * _PLATEAU_DISTANCE_TO_CHANNEL
         distance_to_channel_d8_path = os.path.join(
             self.workspace_dir, 'distance_to_channel_d8.tif')
-        pygeoprocessing.routing.distance_to_channel_d8(
-            (flow_dir_d8_path, 1), (channel_path, 1),
-            distance_to_channel_d8_path,
-            weight_raster_path_band=(flow_dir_d8_weight_path, 1))
 
-        distance_to_channel_d8_array = pygeoprocessing.raster_to_numpy_array(
-            distance_to_channel_d8_path)
-
-        expected_result = weight_factor * numpy.array(
-            [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0],
-             [0, 1, 2, 2, 2, 2, 2, 2, 2, 1, 0],
-             [0, 1, 2, 3, 3, 3, 3, 3, 2, 1, 0],
-             [0, 0, 1, 2, 4, 4, 4, 2, 1, 0, 0],
-             [0, 0, 1, 2, 3, 5, 3, 2, 1, 0, 0],
-             [0, 0, 1, 2, 3, 4, 3, 2, 1, 0, 0],
-             [0, 1, 2, 3, 3, 3, 3, 3, 2, 1, 0],
-             [0, 1, 2, 2, 2, 2, 2, 2, 2, 1, 0],
-             [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]])
-
-        numpy.testing.assert_almost_equal(
-            distance_to_channel_d8_array, expected_result)
+        # Check both float and integer weights.  Each run writes over the
+        # previous result.
+        for weight_dtype in (numpy.float32, numpy.int32):
+            with self.subTest(dtype=weight_dtype):
+                flow_dir_d8_weight_path = os.path.join(
+                    self.workspace_dir,
+                    f'flow_dir_d8_{numpy.dtype(weight_dtype).name}.tif')
+                _write_constant_raster(
+                    flow_dir_d8_weight_path, _PLATEAU_FLOW_DIR.shape,
+                    weight_factor, weight_dtype)
+
+                pygeoprocessing.routing.distance_to_channel_d8(
+                    (flow_dir_d8_path, 1), (channel_path, 1),
+                    distance_to_channel_d8_path,
+                    weight_raster_path_band=(flow_dir_d8_weight_path, 1))
+
+                distance_to_channel_d8_array = (
+                    pygeoprocessing.raster_to_numpy_array(
+                        distance_to_channel_d8_path))
+
+                numpy.testing.assert_array_equal(
+                    distance_to_channel_d8_array, expected_result)
 
         # try with zero weights
-        zero_array = numpy.zeros(
-            distance_to_channel_d8_array.shape, dtype=numpy.float32)
         zero_raster_path = os.path.join(self.workspace_dir, 'zero.tif')
-
-        _array_to_raster(zero_array, None, zero_raster_path)
+        zero_array = _write_constant_raster(
+            zero_raster_path, distance_to_channel_d8_array.shape, 0,
+            numpy.float32)
 
         pygeoprocessing.routing.distance_to_channel_d8(
             (flow_dir_d8_path, 1), (channel_path, 1),
             distance_to_channel_d8_path,
             weight_raster_path_band=(zero_raster_path, 1))
 
-        distance_to_channel_d8_array = pygeoprocessing.raster_to_numpy_array(
-            distance_to_channel_d8_path)
+        _read_raster_into(
+            distance_to_channel_d8_path, distance_to_channel_d8_array)
 
-        numpy.testing.assert_almost_equal(
+        numpy.testing.assert_array_equal(
             distance_to_channel_d8_array, zero_array)
 
     def test_distance_to_channel_mfd(self):
         """PGP.routing: test distance to channel mfd."""
-        flow_dir_mfd_array = numpy.array([
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [4603904, 983040, 983040, 983040, 983040, 524296, 15, 15, 15, 15,
-             1073741894],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             17984, 26880],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             17984, 26880],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             17984, 26880],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             17984, 26880],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             1178599424, 26880]], dtype=numpy.int32)
+        # Unlike the rest of the bottom edge, this pixel drains off the
+        # raster and never reaches the channel.
+        flow_dir_mfd_array = _CHANNEL_DEM_MFD_FLOW_DIR.copy()
+        flow_dir_mfd_array[10, 9] = 1178599424
 
         flow_dir_mfd_path = os.path.join(
             self.workspace_dir, 'flow_dir_mfd.tif')
-        _array_to_raster(flow_dir_mfd_array, None, flow_dir_mfd_path)
-
-        # taken from a manual inspection of a flow accumulation run
-        channel_array = numpy.array(
-            [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]], dtype=numpy.uint8)
-        channel_path = os.path.join(self.workspace_dir, 'channel.tif')
-
-        _array_to_raster(channel_array, None, channel_path)
+        _array_to_raster(
+            flow_dir_mfd_array, None, flow_dir_mfd_path,
+            creation_options=_FIXTURE_CREATION_OPTIONS)
 
+        channel_path = self.channel_dem_channel_path
         distance_to_channel_mfd_path = os.path.join(
             self.workspace_dir, 'distance_to_channel_mfd.tif')
         pygeoprocessing.routing.distance_to_channel_mfd(
@@ -909,8 +961,10 @@ class TestRouting(unittest.TestCase):
         distance_to_channel_mfd_array = pygeoprocessing.raster_to_numpy_array(
             distance_to_channel_mfd_path)
 
-        # this is a regression result copied by hand
-        expected_result = numpy.array(
+        # this is a regression result copied by hand. The channel runs along
+        # row 5 and the flow directions are mirrored about it, so the rows
+        # below the channel are the rows above it in reverse.
+        upper_rows = numpy.array(
             [[5.98240137, 6.10285187, 6.15935357, 6.1786881, 6.18299413,
               6.18346732, 6.18299413, 6.1786881, 6.15935357, 6.10285187,
               5.98240137],
@@ -926,131 +980,126 @@ class TestRouting(unittest.TestCase):
              [1.16568542, 1.23669346, 1.23669346, 1.23669346, 1.23669346,
               1.23669346, 1.23669346, 1.23669346, 1.23669346, 1.23669346,
               1.16568542],
-             [0., 0., 0., 0., 0., 0., 0., 0., 0., 0., 0.],
-             [1.16568542, 1.23669346, 1.23669346, 1.23669346, 1.23669346,
-              1.23669346, 1.23669346, 1.23669346, 1.23669346, 1.23669346,
-              1.16568542],
-             [2.35977407, 2.45309892, 2.47338693, 2.47338693, 2.47338693,
-              2.47338693, 2.47338693, 2.47338693, 2.47338693, 2.45309892,
-              2.35977407],
-             [3.56278943, 3.66892471, 3.70428382, 3.71008039, 3.71008039,
-              3.71008039, 3.71008039, 3.71008039, 3.70428382, 3.66892471,
-              3.56278943],
-             [4.77092897, 4.88539641, 4.93253084, 4.94511769, 4.94677386,
-              4.94677386, 4.94677386, 4.94511769, 4.93253084, 4.88539641,
-              4.77092897],
-             [5.98240137, 6.10285187, 6.15935357, 6.1786881, 6.18299413,
-              6.18346732, 6.18299413, 6.1786881, 6.15935357, -1,
-              5.98240137]])
+             [0., 0., 0., 0., 0., 0., 0., 0., 0., 0., 0.]])
+        expected_result = numpy.vstack((upper_rows, upper_rows[-2::-1]))
+        # except for the one pixel that drains off the raster
+        expected_result[10, 9] = -1
 
-        numpy.testing.assert_almost_equal(
-            distance_to_channel_mfd_array, expected_result)
+        numpy.testing.assert_allclose(
+            distance_to_channel_mfd_array, expected_result, rtol=0, atol=1e-7)
 
     def test_distance_to_channel_mfd_with_weights(self):
         """PGP.routing: test distance to channel mfd with weights."""
-        flow_dir_mfd_array = numpy.array([
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [1761607680, 1178599424, 1178599424, 1178599424, 1178599424,
-             1178599424, 1178599424, 1178599424, 1178599424, 1178599424,
-             157286400],
-            [4603904, 983040, 983040, 983040, 983040, 524296, 15, 15, 15, 15,
-             1073741894],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             17984, 26880],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             17984, 26880],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             17984, 26880],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             17984, 26880],
-            [2400, 17984, 17984, 17984, 17984, 17984, 17984, 17984, 17984,
-             17984, 26880]], dtype=numpy.int32)
-
-        flow_dir_mfd_path = os.path.join(
-            self.workspace_dir, 'flow_dir_mfd.tif')
-        _array_to_raster(flow_dir_mfd_array, None, flow_dir_mfd_path)
-
-        flow_weight_array = numpy.empty(
-            flow_dir_mfd_array.shape, dtype=numpy.int32)
-        flow_weight_array[:] = 2.0
-        flow_dir_mfd_weight_path = os.path.join(
-            self.workspace_dir, 'flow_dir_mfd_weights.tif')
-
-        _array_to_raster(flow_weight_array, None, flow_dir_mfd_weight_path)
-
-        # taken from a manual inspection of a flow accumulation run
-        channel_path = os.path.join(self.workspace_dir, 'channel.tif')
-        channel_array = numpy.array(
-            [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]], dtype=numpy.uint8)
-        _array_to_raster(channel_array, None, channel_path)
+        flow_dir_mfd_path = self.channel_dem_mfd_flow_dir_path
 
+        weight_factor = 2.0
+        channel_path = self.channel_dem_channel_path
         distance_to_channel_mfd_path = os.path.join(
             self.workspace_dir, 'distance_to_channel_mfd.tif')
-        pygeoprocessing.routing.distance_to_channel_mfd(
-            (flow_dir_mfd_path, 1), (channel_path, 1),
-            distance_to_channel_mfd_path,
-            weight_raster_path_band=(flow_dir_mfd_weight_path, 1))
-
-        distance_to_channel_mfd_array = pygeoprocessing.raster_to_numpy_array(
-            distance_to_channel_mfd_path)
 
-        # this is a regression result copied by hand
-        expected_result = numpy.array(
-            [
-             [10., 10., 10., 10., 10., 10., 10., 10., 10., 10., 10.],
-             [8., 8., 8., 8., 8., 8., 8., 8., 8., 8., 8.],
-             [6., 6., 6., 6., 6., 6., 6., 6., 6., 6., 6.],
-             [4., 4., 4., 4., 4., 4., 4., 4., 4., 4., 4.],
-             [2., 2., 2., 2., 2., 2., 2., 2., 2., 2., 2.],
-             [0., 0., 0., 0., 0., 0., 0., 0., 0., 0., 0.],
-             [2., 2., 2., 2., 2., 2., 2., 2., 2., 2., 2.],
-             [4., 4., 4., 4., 4., 4., 4., 4., 4., 4., 4.],
-             [6., 6., 6., 6., 6., 6., 6., 6., 6., 6., 6.],
-             [8., 8., 8., 8., 8., 8., 8., 8., 8., 8., 8.],
-             [10., 10., 10., 10., 10., 10., 10., 10., 10., 10., 10.],
-            ])
-
-        numpy.testing.assert_almost_equal(
-            distance_to_channel_mfd_array, expected_result)
+        # with a weight raster each step downstream costs the weight instead
+        # of its length, so a pixel's distance is its number of rows away from
+        # the channel on row 5 times the weight
+        expected_result = numpy.repeat(
+            weight_factor * numpy.abs(numpy.arange(11) - 5)[:, None], 11,
+            axis=1)
+
+        # Check both float and integer weights.  Each run writes over the
+        # previous result.
+        for weight_dtype in (numpy.float32, numpy.int32):
+            with self.subTest(dtype=weight_dtype):
+                flow_dir_mfd_weight_path = os.path.join(
+                    self.workspace_dir,
+                    f'flow_dir_mfd_weights_'
+                    f'{numpy.dtype(weight_dtype).name}.tif')
+                _write_constant_raster(
+                    flow_dir_mfd_weight_path, _CHANNEL_DEM_MFD_FLOW_DIR.shape,
+                    weight_factor, weight_dtype)
+
+                pygeoprocessing.routing.distance_to_channel_mfd(
+                    (flow_dir_mfd_path, 1), (channel_path, 1),
+                    distance_to_channel_mfd_path,
+                    weight_raster_path_band=(flow_dir_mfd_weight_path, 1))
+
+                distance_to_channel_mfd_array = (
+                    pygeoprocessing.raster_to_numpy_array(
+                        distance_to_channel_mfd_path))
+
+                numpy.testing.assert_allclose(
+                    distance_to_channel_mfd_array, expected_result, rtol=0,
+                    atol=1e-7)
 
         # try with zero weights
         zero_array = numpy.zeros(
             expected_result.shape, dtype=numpy.float32)
         zero_raster_path = os.path.join(self.workspace_dir, 'zero.tif')
-        _array_to_raster(zero_array, 0, zero_raster_path)
+        _array_to_raster(
+            zero_array, 0, zero_raster_path,
+            creation_options=_FIXTURE_CREATION_OPTIONS)
 
         pygeoprocessing.routing.distance_to_channel_mfd(
             (flow_dir_mfd_path, 1), (channel_path, 1),
             distance_to_channel_mfd_path,
             weight_raster_path_band=(zero_raster_path, 1))
 
+        _read_raster_into(
+            distance_to_channel_mfd_path, distance_to_channel_mfd_array)
+
+        numpy.testing.assert_allclose(
+            distance_to_channel_mfd_array, zero_array, rtol=0, atol=1e-7)
+
+
+    def test_distance_to_channel_mfd_with_int_weight_nodata(self):
+        """PGP.routing: test distance to channel mfd with int weight nodata."""
+        flow_dir_mfd_path = self.channel_dem_mfd_flow_dir_path
+        channel_path = self.channel_dem_channel_path
+
+        # Integer weights that differ by column, with nodata in a few pixels
+        # above and below the channel and in the channel itself.  A step into
+        # a nodata weight pixel costs nothing.
+        weight_nodata = -1
+        weight_array = numpy.tile(
+            numpy.arange(1, 12, dtype=numpy.int32), (11, 1))
+        weight_array[[2, 8], 3] = weight_nodata
+        weight_array[5, 7] = weight_nodata
+        weight_path = os.path.join(self.workspace_dir, 'weights.tif')
+        _array_to_raster(
+            weight_array, weight_nodata, weight_path,
+            creation_options=_FIXTURE_CREATION_OPTIONS)
+
+        distance_to_channel_mfd_path = os.path.join(
+            self.workspace_dir, 'distance_to_channel_mfd.tif')
+        pygeoprocessing.routing.distance_to_channel_mfd(
+            (flow_dir_mfd_path, 1), (channel_path, 1),
+            distance_to_channel_mfd_path,
+            weight_raster_path_band=(weight_path, 1))
+
         distance_to_channel_mfd_array = pygeoprocessing.raster_to_numpy_array(
             distance_to_channel_mfd_path)
 
-        numpy.testing.assert_almost_equal(
-            distance_to_channel_mfd_array, zero_array)
+        # this is a regression result of the implementation before the
+        # upstream walk was moved to C variables.  The weights and flow
+        # directions are mirrored about the channel on row 5, so the rows
+        # below the channel are the rows above it in reverse.
+        upper_rows = numpy.array(
+            [[8.99291522, 10.81946122, 14.25389945, 18.53425834, 23.60420063,
+              28.70244541, 33.43132028, 38.13451062, 43.17917011,
+              47.82449427, 50.32982031],
+             [6.86027755, 8.69187172, 10.97002915, 14.24173261, 18.53727613,
+              23.06705539, 26.32069971, 29.96151603, 34.20781341,
+              38.35385923, 40.6471277],
+             [4.86971429, 6.34612245, 9.03265306, 12., 14.81341108,
+              17.16034985, 19.18075802, 21.6909621, 25.14810496,
+              28.81422741, 30.86906122],
+             [3.04, 4.11428571, 6., 8., 10., 11.34693878, 12.04081633,
+              13.2244898, 16.04081633, 19.23265306, 20.96],
+             [1.4, 2., 3., 4., 5., 6., 4.71428571, 4.57142857, 6.71428571,
+              10., 10.6],
+             [0., 0., 0., 0., 0., 0., 0., 0., 0., 0., 0.]])
+        expected_result = numpy.vstack((upper_rows, upper_rows[-2::-1]))
 
+        numpy.testing.assert_allclose(
+            distance_to_channel_mfd_array, expected_result, rtol=0, atol=1e-7)
 
     def test_distance_to_channel_mfd_no_stream(self):
         """PGP.routing: MFD stream distance including area that doesn't drain to stream."""
@@ -1092,8 +1141,12 @@ class TestRouting(unittest.TestCase):
         flow_dir_path = os.path.join(self.workspace_dir, 'flow_dir.tif')
         stream_path = os.path.join(self.workspace_dir, 'stream.tif')
         target_path = os.path.join(self.workspace_dir, 'distance.tif')
-        _array_to_raster(flow_dir_array, flow_dir_nodata, flow_dir_path)
-        _array_to_raster(stream_array, None, stream_path)
+        _array_to_raster(
+            flow_dir_array, flow_dir_nodata, flow_dir_path,
+            creation_options=_FIXTURE_CREATION_OPTIONS)
+        _array_to_raster(
+            stream_array, None, stream_path,
+            creation_options=_FIXTURE_CREATION_OPTIONS)
         pygeoprocessing.routing.distance_to_channel_mfd(
             (flow_dir_path, 1), (stream_path, 1), target_path)
 
@@ -1175,12 +1228,9 @@ class TestRouting(unittest.TestCase):
             autotune_flow_accumulation=False,
             min_flow_accum_threshold=1)
 
-        stream_vector = gdal.OpenEx(
-            no_autotune_stream_vector_path, gdal.OF_VECTOR)
-        stream_layer = stream_vector.GetLayer()
-        self.assertEqual(stream_layer.GetFeatureCount(), n*2+1)
-        stream_layer = None
-        stream_vector = None
+        with _open_vector_layer(
+                no_autotune_stream_vector_path) as stream_layer:
+            self.assertEqual(stream_layer.GetFeatureCount(), n*2+1)
 
         autotune_stream_vector_path = os.path.join(
             self.workspace_dir, 'autotune_stream.gpkg')
@@ -1192,20 +1242,17 @@ class TestRouting(unittest.TestCase):
             autotune_flow_accumulation=True,
             min_flow_accum_threshold=2)
 
-        stream_vector = gdal.OpenEx(
-            autotune_stream_vector_path, gdal.OF_VECTOR)
-        stream_layer = stream_vector.GetLayer()
-        self.assertEqual(stream_layer.GetFeatureCount(), n-3)
+        with _open_vector_layer(autotune_stream_vector_path) as stream_layer:
+            self.assertEqual(stream_layer.GetFeatureCount(), n-3)
 
-        # this gets just the single outlet feature
-        stream_layer.SetAttributeFilter(f'"outlet"=1')
-        outlet_feature = next(iter(stream_layer))
+            # this gets just the single outlet feature
+            stream_layer.SetAttributeFilter(f'"outlet"=1')
+            outlet_feature = next(iter(stream_layer))
 
-        # known to be order 2 because none of the streams can branch more
-        # than once
-        self.assertEqual(outlet_feature.GetField('order'), 2)
-        stream_vector = None
-        stream_layer = None
+            # known to be order 2 because none of the streams can branch more
+            # than once
+            self.assertEqual(outlet_feature.GetField('order'), 2)
+            outlet_feature = None
 
         watershed_confluence_vector_path = os.path.join(
             self.workspace_dir, 'watershed_confluence.gpkg')
@@ -1213,28 +1260,58 @@ class TestRouting(unittest.TestCase):
             (flow_dir_d8_path, 1), autotune_stream_vector_path,
             watershed_confluence_vector_path, outlet_at_confluence=True)
 
-        watershed_vector = gdal.OpenEx(
-            watershed_confluence_vector_path, gdal.OF_VECTOR)
-        watershed_layer = watershed_vector.GetLayer()
-        # there should be exactly an integer half number of watersheds as
-        # the length of the canyon; -1 for the special configuration
-        # around the nodata pixel.
-        self.assertEqual(watershed_layer.GetFeatureCount(), n//2 - 1)
-        watershed_vector = None
-        watershed_layer = None
+        with _open_vector_layer(
+                watershed_confluence_vector_path) as watershed_layer:
+            # there should be exactly an integer half number of watersheds as
+            # the length of the canyon; -1 for the special configuration
+            # around the nodata pixel.
+            self.assertEqual(watershed_layer.GetFeatureCount(), n//2 - 1)
 
-        watershed_confluence_vector_path = os.path.join(
-            self.workspace_dir, 'watershed_confluence.gpkg')
+        # Write over the previous result to check that an existing target
+        # vector is replaced.
         pygeoprocessing.routing.calculate_subwatershed_boundary(
             (flow_dir_d8_path, 1), autotune_stream_vector_path,
             watershed_confluence_vector_path, outlet_at_confluence=False)
 
-        watershed_vector = gdal.OpenEx(
-            watershed_confluence_vector_path, gdal.OF_VECTOR)
-        watershed_layer = watershed_vector.GetLayer()
-        self.assertEqual(watershed_layer.GetFeatureCount(), n-4)
-        watershed_vector = None
-        watershed_layer = None
+        with _open_vector_layer(
+                watershed_confluence_vector_path) as watershed_layer:
+            self.assertEqual(watershed_layer.GetFeatureCount(), n-4)
+
+    def test_extract_strahler_streams_d8_long_stream(self):
+        """PGP.routing: test a stream that spans more blocks than are cached."""
+        # A single row where every pixel flows east, off the raster. With
+        # 16x16 blocks the stream crosses 81 blocks, more than the 64 that a
+        # managed raster caches.
+        n_cols = 16 * 80 + 2
+        flow_dir_array = numpy.zeros((1, n_cols), dtype=numpy.uint8)
+        flow_accum_array = numpy.arange(
+            1, n_cols + 1, dtype=numpy.float64).reshape((1, n_cols))
+        dem_array = flow_accum_array[:, ::-1].copy()
+
+        flow_dir_path = os.path.join(self.workspace_dir, 'flow_dir.tif')
+        flow_accum_path = os.path.join(self.workspace_dir, 'flow_accum.tif')
+        dem_path = os.path.join(self.workspace_dir, 'dem.tif')
+        for array, nodata, path in [
+                (flow_dir_array, 255, flow_dir_path),
+                (flow_accum_array, -1, flow_accum_path),
+                (dem_array, -1, dem_path)]:
+            _array_to_raster(
+                array, nodata, path,
+                creation_options=_FIXTURE_CREATION_OPTIONS)
+
+        stream_vector_path = os.path.join(self.workspace_dir, 'stream.gpkg')
+        pygeoprocessing.routing.extract_strahler_streams_d8(
+            (flow_dir_path, 1), (flow_accum_path, 1), (dem_path, 1),
+            stream_vector_path, min_flow_accum_threshold=1)
+
+        # The outlet's flow accumulation is read again after the upstream walk
+        # has evicted the outlet's block from the cache.
+        with _open_vector_layer(stream_vector_path) as stream_layer:
+            self.assertEqual(stream_layer.GetFeatureCount(), 1)
+            stream_feature = next(iter(stream_layer))
+            self.assertEqual(stream_feature.GetField('ds_x'), n_cols - 1)
+            self.assertEqual(stream_feature.GetField('ds_fa'), n_cols)
+            stream_feature = None
 
     def test_single_drain_point(self):
         """PGP.routing: test single_drain_point pitfill."""
@@ -1301,7 +1378,6 @@ class TestRouting(unittest.TestCase):
 
     def test_channel_not_exist_distance(self):
         """PGP.routing: test for nodata result if channel doesn't exist."""
-        from osgeo import osr
         srs = osr.SpatialReference()
         srs.ImportFromEPSG(3857)
         projection_wkt = srs.ExportToWkt()
@@ -1319,22 +1395,24 @@ class TestRouting(unittest.TestCase):
             self.workspace_dir, 'test_stream_distance_output.tif')
         pygeoprocessing.numpy_array_to_raster(
             flow_dir, nodata, (10, -10), (1000, 1000), projection_wkt,
-            flow_dir_path)
+            flow_dir_path,
+            raster_driver_creation_tuple=('GTiff', _FIXTURE_CREATION_OPTIONS))
         pygeoprocessing.numpy_array_to_raster(
             streams, nodata, (10, -10), (1000, 1000), projection_wkt,
-            streams_path)
+            streams_path,
+            raster_driver_creation_tuple=('GTiff', _FIXTURE_CREATION_OPTIONS))
 
         pygeoprocessing.routing.distance_to_channel_d8(
             (flow_dir_path, 1), (streams_path, 1), distance_path)
-        numpy.testing.assert_almost_equal(
+        numpy.testing.assert_allclose(
             pygeoprocessing.raster_to_numpy_array(distance_path),
-            expected_result)
+            expected_result, rtol=0, atol=1e-7)
 
         pygeoprocessing.routing.distance_to_channel_mfd(
             (flow_dir_path, 1), (streams_path, 1), distance_path)
-        numpy.testing.assert_almost_equal(
+        numpy.testing.assert_allclose(
             pygeoprocessing.raster_to_numpy_array(distance_path),
-            expected_result)
+            expected_result, rtol=0, atol=1e-7)
 
     def test_extract_streams_d8(self):
         """PGP.routing: test d8 stream thresholding."""
@@ -1381,22 +1459,7 @@ class TestRouting(unittest.TestCase):
 
     def test_flow_accum_d8_with_decay(self):
         """PGP.routing: test d8 flow accumulation with decay."""
-        # this was generated from a pre-calculated plateau drain dem
-        flow_dir_array = numpy.array([
-            [2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0],
-            [4, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0],
-            [4, 4, 2, 2, 2, 2, 2, 2, 2, 0, 0],
-            [4, 4, 4, 2, 2, 2, 2, 2, 0, 0, 0],
-            [4, 4, 4, 4, 2, 2, 2, 0, 0, 0, 0],
-            [4, 4, 4, 4, 4, 2, 0, 0, 0, 0, 0],
-            [4, 4, 4, 4, 4, 6, 0, 0, 0, 0, 0],
-            [4, 4, 4, 4, 6, 6, 6, 0, 0, 0, 0],
-            [4, 4, 4, 6, 6, 6, 6, 6, 0, 0, 0],
-            [4, 4, 6, 6, 6, 6, 6, 6, 6, 0, 0],
-            [4, 6, 6, 6, 6, 6, 6, 6, 6, 6, 0]], dtype=numpy.uint8)
-
-        flow_dir_path = os.path.join(self.workspace_dir, 'flow_dir.tif')
-        _array_to_raster(flow_dir_array, None, flow_dir_path)
+        flow_dir_path = self.plateau_flow_dir_path
 
         target_flow_accum_path = os.path.join(
             self.workspace_dir, 'flow_accum.tif')
@@ -1405,7 +1468,7 @@ class TestRouting(unittest.TestCase):
         const_decay_factor = 0.5
         decay_factor_path = os.path.join(
             self.workspace_dir, 'decay_factor.tif')
-        decay_array = numpy.full(flow_dir_array.shape, const_decay_factor,
+        decay_array = numpy.full(_PLATEAU_FLOW_DIR.shape, const_decay_factor,
                                  dtype=numpy.float32)
         _array_to_raster(decay_array, None, decay_factor_path)
 
@@ -1416,7 +1479,7 @@ class TestRouting(unittest.TestCase):
 
             flow_accum_array = pygeoprocessing.raster_to_numpy_array(
                 target_flow_accum_path)
-            self.assertEqual(flow_accum_array.dtype, numpy.float64)
+            self.assertEqual(flow_accum_array.dtype.char, 'd')
 
             # This array is a regression result saved by hand, but
             # because this flow accumulation doesn't have any joining flow
@@ -1,9 +1,11 @@
 """pygeoprocessing.watersheds testing suite."""
+import contextlib
 import glob
 import os
 import shutil
 import tempfile
 import unittest
+import uuid
 
 import numpy
 import pygeoprocessing
@@ -14,17 +16,42 @@ from osgeo import ogr
 from osgeo import osr
 from pygeoprocessing.routing import watershed
 
+# The flow direction fixtures are only a few pixels across, so write them as
+# classic (not BigTIFF) GeoTiffs with a single small, uncompressed tile.  The
+# routing functions require power-of-two block sizes.
+_FLOW_DIR_CREATION_TUPLE = ('GTiff', (
+    'TILED=YES', 'BIGTIFF=NO', 'BLOCKXSIZE=16', 'BLOCKYSIZE=16'))
+
+# Undoes the GDAL settings made for this module once its tests are done.
+_MODULE_GDAL_SETTINGS = contextlib.ExitStack()
+
+
+def setUpModule():
+    """Cap GDAL's block cache at 16 MB for these small rasters."""
+    _MODULE_GDAL_SETTINGS.callback(gdal.SetCacheMax, gdal.GetCacheMax())
+    gdal.SetCacheMax(16 * 1024 * 1024)
+
+
+def tearDownModule():
+    """Restore the GDAL settings from before these tests."""
+    _MODULE_GDAL_SETTINGS.close()
+
 
 class WatershedDelineationTests(unittest.TestCase):
     """Main Watershed test module."""
 
     def setUp(self):
-        """Create empty workspace dir."""
+        """Create empty workspace dirs."""
         self.workspace_dir = tempfile.mkdtemp()
+        # Input rasters are only read, so keep them in GDAL's in-memory
+        # filesystem.
+        self.vsimem_dir = f'/vsimem/test_watersheds_{uuid.uuid4().hex}'
 
     def tearDown(self):
-        """Delete workspace dir."""
+        """Delete workspace dirs."""
         shutil.rmtree(self.workspace_dir)
+        for filename in gdal.ReadDirRecursive(self.vsimem_dir) or []:
+            gdal.Unlink(f'{self.vsimem_dir}/{filename}')
 
     def test_watersheds_diagnostic_vector(self):
         """PGP watersheds: test diagnostic vector."""
@@ -45,14 +72,15 @@ class WatershedDelineationTests(unittest.TestCase):
         srs.ImportFromEPSG(32731)  # WGS84 / UTM zone 31s
         srs_wkt = srs.ExportToWkt()
 
-        flow_dir_path = os.path.join(self.workspace_dir, 'flow_dir.tif')
+        flow_dir_path = f'{self.vsimem_dir}/flow_dir.tif'
         pygeoprocessing.numpy_array_to_raster(
             base_array=flow_dir_array,
             target_nodata=255,
             pixel_size=(2, -2),
             origin=(2, -2),
             projection_wkt=srs_wkt,
-            target_path=flow_dir_path)
+            target_path=flow_dir_path,
+            raster_driver_creation_tuple=_FLOW_DIR_CREATION_TUPLE)
 
         # These geometries test:
         #  * Delineation works with varying geometry types
@@ -117,14 +145,15 @@ class WatershedDelineationTests(unittest.TestCase):
         srs_wkt = srs.ExportToWkt()
 
         for srs in (srs_wkt, None):
-            flow_dir_path = os.path.join(self.workspace_dir, 'flow_dir.tif')
+            flow_dir_path = f'{self.vsimem_dir}/flow_dir.tif'
             pygeoprocessing.numpy_array_to_raster(
                 base_array=flow_dir_array,
                 target_nodata=255,
                 pixel_size=(2, -2),
                 origin=(2, -2),
                 projection_wkt=srs,
-                target_path=flow_dir_path)
+                target_path=flow_dir_path,
+                raster_driver_creation_tuple=_FLOW_DIR_CREATION_TUPLE)
 
             # These geometries test:
             #  * Delineation works with varying geometry types
@@ -196,6 +225,7 @@ class WatershedDelineationTests(unittest.TestCase):
                     [expected_watershed_geometry],
                     os.path.join(self.workspace_dir, 'foo.gpkg'), srs_wkt,
                     'GPKG', ogr_geom_type=ogr.wkbPolygon)
+                expected_watershed_area = expected_watershed_geometry.area
 
                 id_to_fields = {}
                 for feature in watersheds_layer:
@@ -205,11 +235,11 @@ class WatershedDelineationTests(unittest.TestCase):
                     shapely_geom = shapely.wkb.loads(
                         bytes(geometry.ExportToWkb()))
                     self.assertEqual(
-                        shapely_geom.area, expected_watershed_geometry.area)
+                        shapely_geom.area, expected_watershed_area)
                     self.assertEqual(
                         shapely_geom.intersection(
                             expected_watershed_geometry).area,
-                        expected_watershed_geometry.area)
+                        expected_watershed_area)
                     self.assertEqual(
                         shapely_geom.difference(
                             expected_watershed_geometry).area, 0)
@@ -249,20 +279,15 @@ class WatershedDelineationTests(unittest.TestCase):
         srs.ImportFromEPSG(32731)  # WGS84 / UTM zone 31s
         srs_wkt = srs.ExportToWkt()
 
-        flow_dir_path = os.path.join(self.workspace_dir, 'flow_dir.tif')
-        driver = gdal.GetDriverByName('GTiff')
-        flow_dir_raster = driver.Create(
-            flow_dir_path, flow_dir_array.shape[1], flow_dir_array.shape[0],
-            1, gdal.GDT_Byte, options=(
-                'TILED=YES', 'BIGTIFF=YES', 'COMPRESS=LZW',
-                'BLOCKXSIZE=256', 'BLOCKYSIZE=256'))
-        flow_dir_raster.SetProjection(srs_wkt)
-        flow_dir_band = flow_dir_raster.GetRasterBand(1)
-        flow_dir_band.WriteArray(flow_dir_array)
-        flow_dir_band.SetNoDataValue(255)
-        flow_dir_geotransform = [2, 2, 0, -2, 0, -2]
-        flow_dir_raster.SetGeoTransform(flow_dir_geotransform)
-        flow_dir_raster = None
+        flow_dir_path = f'{self.vsimem_dir}/flow_dir.tif'
+        pygeoprocessing.numpy_array_to_raster(
+            base_array=flow_dir_array,
+            target_nodata=255,
+            pixel_size=(2, -2),
+            origin=(2, -2),
+            projection_wkt=srs_wkt,
+            target_path=flow_dir_path,
+            raster_driver_creation_tuple=_FLOW_DIR_CREATION_TUPLE)
         flow_dir_info = pygeoprocessing.get_raster_info(flow_dir_path)
 
         point = shapely.geometry.Point(2.5, -2.5)
@@ -297,47 +322,19 @@ class WatershedDelineationTests(unittest.TestCase):
         srs.ImportFromEPSG(3157)  # UTM zone 17N
         srs_wkt = srs.ExportToWkt()
 
-        flow_dir_path = os.path.join(self.workspace_dir, 'flow_dir.tif')
-        driver = gdal.GetDriverByName('GTiff')
-        flow_dir_raster = driver.Create(
-            flow_dir_path, flow_dir_array.shape[1], flow_dir_array.shape[0],
-            1, gdal.GDT_Byte, options=(
-                'TILED=YES', 'BIGTIFF=YES', 'COMPRESS=LZW',
-                'BLOCKXSIZE=256', 'BLOCKYSIZE=256'))
-        flow_dir_raster.SetProjection(srs_wkt)
-        flow_dir_band = flow_dir_raster.GetRasterBand(1)
-        flow_dir_band.WriteArray(flow_dir_array)
-        flow_dir_band.SetNoDataValue(255)
+        flow_dir_path = f'{self.vsimem_dir}/flow_dir.tif'
         pixel_xsize = 30
         pixel_ysize = -30
-        flow_dir_geotransform = [
-            443723, pixel_xsize, 0,
-            4956546, 0, pixel_ysize]
-        flow_dir_raster.SetGeoTransform(flow_dir_geotransform)
-        flow_dir_raster = None
+        pygeoprocessing.numpy_array_to_raster(
+            base_array=flow_dir_array,
+            target_nodata=255,
+            pixel_size=(pixel_xsize, pixel_ysize),
+            origin=(443723, 4956546),
+            projection_wkt=srs_wkt,
+            target_path=flow_dir_path,
+            raster_driver_creation_tuple=_FLOW_DIR_CREATION_TUPLE)
         flow_dir_info = pygeoprocessing.get_raster_info(flow_dir_path)
-
-        pixel_indexes_array = numpy.arange(
-            flow_dir_array.size).reshape(flow_dir_array.shape)
-        pixel_indexes_path = os.path.join(
-            self.workspace_dir, 'pixel_indexes.tif')
-        driver = gdal.GetDriverByName('GTiff')
-        pixel_indexes_raster = driver.Create(
-            pixel_indexes_path, pixel_indexes_array.shape[1],
-            pixel_indexes_array.shape[0], 1, gdal.GDT_Byte, options=(
-                'TILED=YES', 'BIGTIFF=YES', 'COMPRESS=LZW',
-                'BLOCKXSIZE=256', 'BLOCKYSIZE=256'))
-        pixel_indexes_raster.SetProjection(srs_wkt)
-        pixel_indexes_band = pixel_indexes_raster.GetRasterBand(1)
-        pixel_indexes_band.WriteArray(pixel_indexes_array)
-        pixel_indexes_band.SetNoDataValue(255)
-        pixel_xsize = 30
-        pixel_ysize = -30
-        pixel_indexes_geotransform = [
-            443723, pixel_xsize, 0,
-            4956546, 0, pixel_ysize]
-        pixel_indexes_raster.SetGeoTransform(pixel_indexes_geotransform)
-        pixel_indexes_raster = None
+        flow_dir_geotransform = flow_dir_info['geotransform']
 
         point = shapely.geometry.Point(
             flow_dir_geotransform[0] + pixel_xsize / 2.,